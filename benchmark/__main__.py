@@ -0,0 +1,125 @@
+"""Time plotter and preprocess stages over generated price histories
+
+Usage: python -m benchmark [--files N] [--years M] [--output results.json] [--baseline baseline.json]
+
+Results are written as json.  Given a baseline (results of an earlier run),
+stages slower than the baseline by more than the threshold are reported and
+the exit status is 1.
+"""
+import argparse
+from datetime import datetime
+import json
+import logging
+import platform
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+from typing import Optional
+
+from benchmark.generator import generate
+
+_logger = logging.getLogger(__name__)
+
+_RESULTS_VERSION = 1
+# Differences below this are timer noise however large the ratio
+_NOISE_SECONDS = 0.005
+
+
+# _____________________________________________________________________________
+def configure_logging():
+    # Stage timings only; modules benchmarked log at debug and info
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    logging.getLogger('benchmark').setLevel(logging.INFO)
+    logging.getLogger(__name__).setLevel(logging.INFO)
+    logging.getLogger('pdfminer').setLevel(logging.ERROR)
+
+
+# _____________________________________________________________________________
+def make_results(stage_runs: dict[str, list[float]], parameters: dict) -> dict:
+    stages = {name: {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+              for name, runs in stage_runs.items()}
+    return {'version': _RESULTS_VERSION, 'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'parameters': parameters, 'stages': stages}
+
+
+# _____________________________________________________________________________
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Log minimum time of each stage against baseline, returning stages slower by more than threshold"""
+    if results['parameters'] != baseline.get('parameters'):
+        _logger.warning(f'Baseline parameters differ: {baseline.get("parameters")}')
+
+    regressions = []
+    for name, stage in results['stages'].items():
+        if (base := baseline.get('stages', {}).get(name)) is None:
+            _logger.info(f'{name:<32} {stage["min"]:8.4f}s  no baseline')
+            continue
+        ratio = stage['min'] / base['min'] if base['min'] else float('inf')
+        regressed = ratio > 1 + threshold and stage['min'] - base['min'] > _NOISE_SECONDS
+        _logger.info(f'{name:<32} {stage["min"]:8.4f}s  baseline {base["min"]:8.4f}s  {ratio:6.2f}x'
+                     f'{"  REGRESSION" if regressed else ""}')
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+# _____________________________________________________________________________
+def parse_args(args=None) -> argparse.Namespace:
+    arg_parser = argparse.ArgumentParser(prog='benchmark', description='Time plotter and preprocess stages')
+    arg_parser.add_argument('stages', nargs='*',
+                            help='stages to run, by name or name prefix (default: all)')
+    arg_parser.add_argument('--files', type=int, default=10,
+                            help='number of generated files of each kind (default: 10)')
+    arg_parser.add_argument('--years', type=int, default=10,
+                            help='years of daily prices in each file (default: 10)')
+    arg_parser.add_argument('--seed', type=int, default=1,
+                            help='random seed of generated data (default: 1)')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3,
+                            help='runs of each stage, the minimum is compared (default: 3)')
+    arg_parser.add_argument('--work', type=Path, default=None,
+                            help='folder for generated data and outputs (default: temporary folder)')
+    arg_parser.add_argument('-o', '--output', type=Path, default=None,
+                            help='write results as json to file')
+    arg_parser.add_argument('-b', '--baseline', type=Path, default=None,
+                            help='compare with results json of an earlier run')
+    arg_parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                            help='slowdown relative to baseline reported as a regression (default: 0.2)')
+    return arg_parser.parse_args(args)
+
+
+# _____________________________________________________________________________
+def run(args: argparse.Namespace, work_path: Path) -> dict:
+    from benchmark import suite
+
+    data = generate(work_path, args.files, args.years, args.seed)
+    stage_runs = suite.run(data, work_path, args.repeat, args.stages)
+    parameters = {'files': args.files, 'years': args.years, 'seed': args.seed}
+    return make_results(stage_runs, parameters)
+
+
+# _____________________________________________________________________________
+def main(args: Optional[list[str]] = None) -> int:
+    args = parse_args(args)
+    configure_logging()
+
+    if args.work:
+        results = run(args, args.work.resolve())
+    else:
+        with tempfile.TemporaryDirectory(prefix='benchmark-') as work_path:
+            results = run(args, Path(work_path))
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        _logger.info(f'Results written to "{args.output}"')
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+        if regressions:
+            _logger.error(f'Regressions: {", ".join(regressions)}')
+            return 1
+    return 0
+
+
+# _____________________________________________________________________________
+if __name__ == '__main__':
+    sys.exit(main())
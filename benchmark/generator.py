@@ -0,0 +1,168 @@
+"""Deterministic synthetic price histories for benchmarks
+
+Writes Yahoo style csv files and fund csv files (as written by preprocess)
+for the plotter, raw provider files for the preprocessors, and a
+plots.config.yaml plotting them.  The same seed, counts and years always
+produce identical files.
+"""
+from dataclasses import dataclass
+from datetime import date
+import logging
+import numpy as np
+from pathlib import Path
+import shutil
+
+_logger = logging.getLogger(__name__)
+
+_SCHEMA_FILEPATH = Path(__file__).parents[1] / 'plotter' / 'plots.config.schema.yaml'
+_END_DATE = date(2021, 6, 30)
+_CODES_PER_PLOT = 5
+_DISTRIBUTION_INTERVAL = 125
+
+
+# _____________________________________________________________________________
+@dataclass
+class GeneratedData:
+    __slots__ = ['data_path', 'preprocess_data_path', 'config_filepath', 'yahoo_codes', 'fund_codes']
+
+    data_path: Path
+    preprocess_data_path: Path
+    config_filepath: Path
+    yahoo_codes: list[str]
+    fund_codes: list[str]
+
+
+# _____________________________________________________________________________
+def _business_days(years: int) -> np.ndarray:
+    end = np.datetime64(_END_DATE, 'D')
+    start = end - np.timedelta64(round(years * 365.25), 'D')
+    return np.arange(start, end + 1, dtype='datetime64[D]')[np.is_busday(np.arange(start, end + 1))]
+
+
+# _____________________________________________________________________________
+def _random_walk(rng: np.random.Generator, n: int, start: float) -> np.ndarray:
+    """Log normal daily prices with a small drift"""
+    returns = rng.normal(0.0003, 0.02, n)
+    return start * np.exp(np.cumsum(returns))
+
+
+# _____________________________________________________________________________
+def _format_dates(days: np.ndarray, fmt: str) -> list[str]:
+    return [x.strftime(fmt) for x in days.astype(object)]
+
+
+# _____________________________________________________________________________
+def _write_lines(filepath: Path, lines: list[str]):
+    filepath.write_text('\n'.join(lines) + '\n')
+
+
+# _____________________________________________________________________________
+def write_yahoo(filepath: Path, rng: np.random.Generator, days: np.ndarray):
+    """Daily prices oldest first: Date, Open, High, Low, Close, Adj Close, Volume"""
+    close = _random_walk(rng, len(days), rng.uniform(5, 500))
+    open_ = close * (1 + rng.normal(0, 0.005, len(days)))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, len(days)))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, len(days)))
+    adj = close * np.linspace(0.9, 1.0, len(days))
+    volume = rng.integers(10_000, 10_000_000, len(days))
+    lines = ['Date,Open,High,Low,Close,Adj Close,Volume']
+    lines += [f'{d},{o:.6f},{h:.6f},{lo:.6f},{c:.6f},{a:.6f},{v}'
+              for d, o, h, lo, c, a, v in zip(_format_dates(days, '%Y-%m-%d'), open_, high, low, close, adj, volume)]
+    _write_lines(filepath, lines)
+
+
+# _____________________________________________________________________________
+def write_fund(filepath: Path, rng: np.random.Generator, days: np.ndarray):
+    """Daily unit prices newest first, as written by preprocess: Date, Adj Exit, Exit"""
+    exit_ = _random_walk(rng, len(days), rng.uniform(0.8, 3))
+    adj_exit = exit_ * np.linspace(0.8, 1.0, len(days))
+    lines = ['Date,Adj Exit,Exit']
+    lines += [f'{d},{a:.4f},{e:.4f}' for d, a, e in zip(_format_dates(days, '%d-%m-%Y'), adj_exit, exit_)][::-1]
+    _write_lines(filepath, lines)
+
+
+# _____________________________________________________________________________
+def write_provider_files(path: Path, rng: np.random.Generator, days: np.ndarray, suffix: str):
+    """Raw unit price files in the layout of each provider handled by preprocess"""
+    prices = _random_walk(rng, len(days), rng.uniform(0.8, 3))
+
+    # Ellerston csv newest first, with an ex distribution row and its cum distribution row every so often
+    lines = ['Date,Fund,Application,NAV,Redemption,Frequency']
+    for i, (d, p) in enumerate(zip(_format_dates(days, '%d/%m/%Y')[::-1], prices[::-1])):
+        if i % _DISTRIBUTION_INTERVAL == 1:
+            lines.append(f'{d},"Micro Cap Fund",{p + .003:.4f},{p + .0015:.4f},{p:.4f} (ex-dist),Daily')
+            lines.append(f'{d},"Micro Cap Fund",{p + .103:.4f},{p + .1015:.4f},{p + .1:.4f} (cum-dist),Daily')
+        else:
+            lines.append(f'{d},"Micro Cap Fund",{p + .003:.4f},{p + .0015:.4f},{p:.4f},Daily')
+    _write_lines(Path(path, f'ellerston-{suffix}.csv'), lines)
+
+    # WCM text saved from PDF, oldest first: date then application, NAV and redemption lines
+    lines = ['WCM Fund', 'Date', 'Application', '']
+    for day, p in zip(days.astype(object), prices):
+        lines += [f'{day.day}/{day.month}/{day.year}', f'{p + .002:.4f}', f'{p + .001:.4f}', f'{p:.4f}', '']
+    _write_lines(Path(path, f'wcm-{suffix}.txt'), lines)
+
+    # Spheria text saved from PDF, oldest first
+    lines = ['Spheria Fund', '']
+    for d, p in zip(_format_dates(days, '%d-%b-%y'), prices):
+        lines += [d, f'${p + .002:.4f}', f'$ {p + .001:.4f}', f'${p:.4f}']
+    _write_lines(Path(path, f'Spheria_{suffix}_UnitPrices.txt'), lines)
+
+    # Investing.com csv newest first
+    lines = ['"Date","Price","Open","High","Low","Vol.","Change %"']
+    for d, p in zip(_format_dates(days, '%b %d, %Y')[::-1], prices[::-1]):
+        lines.append(f'"{d}","{p:.4f}","{p:.4f}","{p:.4f}","{p:.4f}","1.2K","0.1%"')
+    _write_lines(Path(path, f'{suffix}.investing.csv'), lines)
+
+
+# _____________________________________________________________________________
+def write_config(filepath: Path, yahoo_codes: list[str], fund_codes: list[str], years: int):
+    """Plots of groups of Yahoo codes and of each fund, alternating layouts, each with three views"""
+    start_year = _END_DATE.year - max(1, years // 2)
+    views = [f"      - startDate: '{start_year}-01-01'",
+             f"      - startDate: '{_END_DATE.year}-01-01'",
+             "        title: Year to date",
+             "      - title: All available"]
+
+    lines = ['---', 'plots:']
+    groups = [yahoo_codes[i:i + _CODES_PER_PLOT] for i in range(0, len(yahoo_codes), _CODES_PER_PLOT)]
+    for i, codes in enumerate(groups):
+        lines += ['  - tag: Yahoo', '    output:', f'      filename: yahoo-{i}.html']
+        if i % 2:
+            lines += ['      layout: shared', '    downsample:', '      points: 1000']
+        lines += ['    csvFiles:', '      - byCodes:', '          yahooCodes:']
+        lines += [f'            - {code}' for code in codes]
+        lines += ['          fields:', '            Exit: Adj Close', "          dateFormat: '%Y-%m-%d'"]
+        lines += ['    views:', *views]
+    for code in fund_codes:
+        lines += ['  - tag: Fund', '    output:', f'      filename: fund-{code}.html',
+                  '    csvFiles:', '      - byFile:', f'          filename: fund-{code}.csv', f'          code: {code}',
+                  '          fields:', '            Exit: Exit', "          dateFormat: '%d-%m-%Y'",
+                  '    views:', *views]
+    _write_lines(filepath, lines)
+
+
+# _____________________________________________________________________________
+def generate(path: Path, files: int = 10, years: int = 10, seed: int = 1) -> GeneratedData:
+    """Write files Yahoo price files, files fund price files and one set of provider files per file to path"""
+    path = Path(path).resolve()
+    data_path = Path(path, 'data')
+    preprocess_data_path = Path(path, 'preprocess', 'data')
+    data_path.mkdir(parents=True, exist_ok=True)
+    preprocess_data_path.mkdir(parents=True, exist_ok=True)
+    _logger.info(f'Generating {files} files of each kind over {years} years in "{path}"')
+
+    rng = np.random.default_rng(seed)
+    days = _business_days(years)
+    yahoo_codes = [f'SYN{i:03d}' for i in range(files)]
+    fund_codes = [f'F{i:03d}' for i in range(files)]
+    for code in yahoo_codes:
+        write_yahoo(Path(data_path, f'{code}.csv'), rng, days)
+    for code in fund_codes:
+        write_fund(Path(data_path, f'fund-{code}.csv'), rng, days)
+        write_provider_files(preprocess_data_path, rng, days, code)
+
+    config_filepath = Path(path, 'plots.config.yaml')
+    write_config(config_filepath, yahoo_codes, fund_codes, years)
+    shutil.copy(_SCHEMA_FILEPATH, config_filepath.with_suffix('.schema.yaml'))
+    return GeneratedData(data_path, preprocess_data_path, config_filepath, yahoo_codes, fund_codes)
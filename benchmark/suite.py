@@ -0,0 +1,110 @@
+"""Benchmark stages timed separately over generated data
+
+Each stage is run repeat times over all generated files; inputs a stage
+depends on (eg parsed frames for plotting) are prepared once, untimed.
+"""
+import logging
+from pathlib import Path
+import shutil
+import sys
+import time
+from typing import Callable, Optional
+
+# Plotter modules import their siblings by name, as when run from the plotter folder
+sys.path.append(str(Path(__file__).parents[1] / 'plotter'))
+
+from configParser import ConfigParser, ConfigPlot  # noqa: E402
+from dataParser import CsvParser, DataSource, StoreParser  # noqa: E402
+from plotter import plotter as plotter_app  # noqa: E402
+from preprocess.preprocessor import load_preprocessors  # noqa: E402
+from priceStore import PriceStore  # noqa: E402
+
+from benchmark.generator import GeneratedData  # noqa: E402
+
+_logger = logging.getLogger(__name__)
+
+
+# _____________________________________________________________________________
+def _time(func: Callable[[], object], repeat: int) -> list[float]:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+# _____________________________________________________________________________
+def _data_sources(plot_config: ConfigPlot, data_path: Path) -> list[DataSource]:
+    return [DataSource(cf.code, Path(data_path, cf.filename), cf.fields, cf.date_format, cf.resample)
+            for cf in plot_config.csv_files]
+
+
+# _____________________________________________________________________________
+def run(data: GeneratedData, work_path: Path, repeat: int = 3,
+        stages: Optional[list[str]] = None) -> dict[str, list[float]]:
+    """Run stages, or those whose name starts with any of stages, returning run times in seconds by stage"""
+    def selected(name: str) -> bool:
+        return not stages or any(name.startswith(x) for x in stages)
+
+    results = {}
+
+    def bench(name: str, func: Callable[[], object]):
+        if selected(name):
+            results[name] = runs = _time(func, repeat)
+            _logger.info(f'{name:<32} min {min(runs):8.4f}s')
+
+    # Plotter stages, each over all plots
+    plot_configs = ConfigParser.parse(data.config_filepath)
+    bench('ConfigParser.parse', lambda: ConfigParser.parse(data.config_filepath))
+
+    def parse_all():
+        return [CsvParser().parses(_data_sources(pc, data.data_path)) for pc in plot_configs]
+
+    bench('CsvParser.parses', parse_all)
+
+    if selected('StoreParser.parses'):
+        store = PriceStore(Path(work_path, 'store'))
+        store.sync((Path(data.data_path, cf.filename), cf.date_format) for pc in plot_configs for cf in pc.csv_files)
+        bench('StoreParser.parses',
+              lambda: [StoreParser(store).parses(_data_sources(pc, data.data_path)) for pc in plot_configs])
+
+    if selected('plot_chart') or selected('write_html'):
+        frames = parse_all()
+
+        def build_all():
+            return [plotter_app.build_figure(df, pc.tag, pc.views, pc.layout, pc.downsample)
+                    for pc, df in zip(plot_configs, frames)]
+
+        bench('plot_chart', build_all)
+
+        plot_path = Path(work_path, 'plots')
+        plot_path.mkdir(parents=True, exist_ok=True)
+        figures = build_all()
+
+        def write_all():
+            for pc, fig in zip(plot_configs, figures):
+                plotter_app.write_chart(fig, Path(plot_path, pc.filename))
+
+        bench('write_html', write_all)
+
+    # Preprocessor stages, each over all its input files
+    for name, preprocessor in sorted(load_preprocessors().items()):
+        stage_name = f'preprocess.{name}'
+        if not selected(stage_name):
+            continue
+        if not (input_files := preprocessor.input_files(data.preprocess_data_path)):
+            _logger.info(f'{stage_name:<32} skipped, no input files')
+            continue
+
+        out_path = Path(work_path, 'preprocess', 'output', name)
+
+        def process_all():
+            shutil.rmtree(out_path, ignore_errors=True)
+            out_path.mkdir(parents=True)
+            for inp_path in input_files:
+                preprocessor.process_file(inp_path, out_path)
+
+        bench(stage_name, process_all)
+
+    return results
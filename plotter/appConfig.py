@@ -1,6 +1,8 @@
+import copy
 from datetime import date
 import logging.handlers
 from pathlib import Path
+from typing import Optional
 
 from configParser import ConfigParser, ConfigPlot
 
@@ -13,7 +15,9 @@ _PLOTS_CONFIG_FILENAME = 'plots.config.yaml'
 class AppConfig:
 
     # _____________________________________________________________________________
-    def __init__(self, app_path: Path, base_path: Path):
+    def __init__(self, app_path: Path, base_path: Path, snapshot_format: str = 'feather',
+                 snapshot_compression: Optional[str] = None, frame_dtype: str = 'float64',
+                 data_source: str = 'csv', read_threads: int = 4, read_buffer_bytes: int = 64 << 20):
         """Initialises the configuration class
         """
         _logger.debug(f'__init__ app_path "{app_path}"')
@@ -21,6 +25,12 @@ class AppConfig:
         # Initialize
         self._name = app_path.stem
         self._base_path = base_path
+        self._snapshot_format = snapshot_format
+        self._snapshot_compression = snapshot_compression
+        self._frame_dtype = frame_dtype
+        self._data_source = data_source
+        self._read_threads = read_threads
+        self._read_buffer_bytes = read_buffer_bytes
 
         # Folders
         self._data_path = Path(self._base_path, 'data').resolve()
@@ -29,6 +39,11 @@ class AppConfig:
         self._data_frame_path = Path(self._base_data_frame_path, date.today().strftime("%y-%m-%d")).resolve()
         self._plot_base_path = Path(self._output_path, 'plots').resolve()
         self._plot_path = Path(self._plot_base_path, date.today().strftime("%y-%m-%d")).resolve()
+        self._frame_cache_path = Path(self._output_path, 'cache', 'frames').resolve()
+        self._manifest_path = Path(self._output_path, 'manifest.json').resolve()
+        self._config_cache_path = Path(self._output_path, 'cache', 'config').resolve()
+        self._price_store_path = Path(self._output_path, 'store').resolve()
+        self._blob_store_path = Path(self._output_path, 'blobs').resolve()
 
         # Ensure directories pre-exist
         self._data_path.mkdir(parents=True, exist_ok=True)
@@ -38,7 +53,8 @@ class AppConfig:
                       f'data frame path: "{self._data_path}"'
                       f'plot path:       "{self._plot_path}"')
 
-        self._config_plots = ConfigParser.parse(Path(_PLOTS_CONFIG_FILENAME))
+        self._config_filepath = Path(_PLOTS_CONFIG_FILENAME).resolve()
+        self._config_plots = ConfigParser.parse(self._config_filepath, self._config_cache_path)
 
     # _____________________________________________________________________________
     @property
@@ -55,12 +71,84 @@ class AppConfig:
     def data_frame_path(self):
         return self._data_frame_path
 
+    # _____________________________________________________________________________
+    @property
+    def base_data_frame_path(self):
+        return self._base_data_frame_path
+
     # _____________________________________________________________________________
     @property
     def plot_path(self):
         return self._plot_path
 
+    # _____________________________________________________________________________
+    @property
+    def snapshot_format(self):
+        return self._snapshot_format
+
+    # _____________________________________________________________________________
+    @property
+    def snapshot_compression(self):
+        return self._snapshot_compression
+
+    # _____________________________________________________________________________
+    @property
+    def frame_dtype(self):
+        return self._frame_dtype
+
+    # _____________________________________________________________________________
+    @property
+    def data_source(self):
+        return self._data_source
+
+    # _____________________________________________________________________________
+    @property
+    def read_threads(self):
+        return self._read_threads
+
+    # _____________________________________________________________________________
+    @property
+    def read_buffer_bytes(self):
+        return self._read_buffer_bytes
+
+    # _____________________________________________________________________________
+    @property
+    def price_store_path(self):
+        return self._price_store_path
+
+    # _____________________________________________________________________________
+    @property
+    def blob_store_path(self):
+        return self._blob_store_path
+
+    # _____________________________________________________________________________
+    @property
+    def frame_cache_path(self):
+        return self._frame_cache_path
+
+    # _____________________________________________________________________________
+    @property
+    def manifest_path(self):
+        return self._manifest_path
+
+    # _____________________________________________________________________________
+    @property
+    def config_cache_path(self):
+        return self._config_cache_path
+
+    # _____________________________________________________________________________
+    @property
+    def config_filepath(self):
+        return self._config_filepath
+
     # _____________________________________________________________________________
     @property
     def plot_configs(self) -> list[ConfigPlot]:
         return self._config_plots
+
+    # _____________________________________________________________________________
+    def without_plots(self) -> 'AppConfig':
+        """Copy of paths and options only, small enough to send with each worker task"""
+        app_config = copy.copy(self)
+        app_config._config_plots = []
+        return app_config
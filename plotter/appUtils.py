@@ -0,0 +1,61 @@
+"""File and process helpers shared by the plotter and preprocess
+
+Only the standard library is imported, so preprocess can import this module
+as plotter.appUtils while plotter modules import it by name.
+"""
+from contextlib import contextmanager
+import logging.handlers
+import multiprocessing
+import os
+from os import PathLike
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+# _____________________________________________________________________________
+@contextmanager
+def replace_file(filepath: PathLike) -> Iterator[Path]:
+    """Temporary path beside filepath to write to, renamed over filepath once written
+
+    Readers never see a partly written file, and a file hard linked elsewhere
+    (see blobStore) is replaced rather than written through.  The temporary
+    file is removed if writing fails.
+    """
+    filepath = Path(filepath)
+    tmp_filepath = filepath.with_name(f'{filepath.name}.{os.getpid()}.tmp')
+    try:
+        yield tmp_filepath
+        os.replace(tmp_filepath, filepath)
+    finally:
+        tmp_filepath.unlink(missing_ok=True)
+
+
+# _____________________________________________________________________________
+def configure_logging(log_filepath: PathLike, console_level: int = logging.INFO,
+                      quiet_loggers: Iterable[str] = ()) -> list[logging.Handler]:
+    """Configure logging for the main process only
+
+    Log file is truncated when opened so workers must never call this.
+    """
+    lh_file = logging.FileHandler(log_filepath, mode='wt')
+    lh_file.setLevel(logging.DEBUG)
+    lh_console = logging.StreamHandler()
+    lh_console.setLevel(console_level)
+    logging.basicConfig(level=logging.DEBUG, handlers=[lh_file, lh_console])
+    logging.captureWarnings(True)
+    for name in quiet_loggers:
+        logging.getLogger(name).setLevel(logging.ERROR)
+    return [lh_file, lh_console]
+
+
+# _____________________________________________________________________________
+def init_worker_logging(log_queue: multiprocessing.Queue, quiet_loggers: Iterable[str] = ()):
+    """Forward log records of a worker process to the main process, which owns the log file"""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.DEBUG)
+    logging.captureWarnings(True)
+    for name in quiet_loggers:
+        logging.getLogger(name).setLevel(logging.ERROR)
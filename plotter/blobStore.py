@@ -0,0 +1,181 @@
+"""Content addressed store of output files, shared by dated output folders
+
+Each day's plots and data frames are written to new dated folders, yet most
+files are identical to the previous day's.  After a build, files of the
+dated folders are hashed and hard linked with a blob of their content, so
+identical files of any day share one copy on disk.  Files already linked
+(eg reused from an earlier build) are not hashed again.
+
+A blob's link count shows whether any dated folder still uses it, so pruning
+old dated folders then removing blobs with no other link reclaims space.
+Where hard links are not supported files are left as written.
+
+Outputs may be links shared with other days, so writers must replace an
+output file rather than write through it.
+
+Usage: python blobStore.py [--output folder] [--keep-days N] [--ingest] [--dry-run]
+"""
+import argparse
+from datetime import date, datetime, timedelta
+import hashlib
+import logging.handlers
+import os
+from os import PathLike
+from pathlib import Path
+import shutil
+from typing import Iterable
+
+from appUtils import replace_file
+
+_logger = logging.getLogger(__name__)
+_BLOCK_SIZE = 1 << 20
+_DATED_FOLDER_FORMAT = '%y-%m-%d'
+# Temporary files, and profiles which differ on every run so are never shared
+_SKIPPED_SUFFIXES = ('.tmp', '.prof')
+
+
+# _____________________________________________________________________________
+def _file_digest(filepath: Path) -> str:
+    h = hashlib.sha256()
+    with filepath.open(mode='rb') as fp:
+        while block := fp.read(_BLOCK_SIZE):
+            h.update(block)
+    return h.hexdigest()
+
+
+# _____________________________________________________________________________
+def _folder_date(folder: Path):
+    try:
+        return datetime.strptime(folder.name, _DATED_FOLDER_FORMAT).date()
+    except ValueError:
+        return None
+
+
+# _____________________________________________________________________________
+class BlobStore:
+    """Blobs of output file content by sha256, linked from dated output folders"""
+
+    # _____________________________________________________________________________
+    def __init__(self, store_path: PathLike):
+        self._store_path = Path(store_path).resolve()
+
+    # _____________________________________________________________________________
+    def _blob_filepath(self, digest: str) -> Path:
+        return Path(self._store_path, digest[:2], digest)
+
+    # _____________________________________________________________________________
+    def ingest(self, filepath: PathLike) -> bool:
+        """Link file with the blob of its content, returning whether linked
+
+        A file with the content of an existing blob is replaced by a link to
+        the blob, otherwise the file becomes the blob.
+        """
+        filepath = Path(filepath)
+        blob_filepath = self._blob_filepath(_file_digest(filepath))
+        try:
+            if not blob_filepath.exists():
+                blob_filepath.parent.mkdir(parents=True, exist_ok=True)
+                os.link(filepath, blob_filepath)
+            elif not blob_filepath.samefile(filepath):
+                # Link beside the file then rename over it, so the file is never missing
+                with replace_file(filepath) as tmp_filepath:
+                    os.link(blob_filepath, tmp_filepath)
+        except OSError as ex:
+            _logger.debug(f'Not linked "{filepath.name}": {ex}')
+            return False
+        return True
+
+    # _____________________________________________________________________________
+    def ingest_folders(self, paths: Iterable[PathLike], linked_files: bool = False) -> tuple[int, int]:
+        """Ingest files of folders, returning (files linked, bytes shared with earlier files)
+
+        Files with other links are taken to be shared already and skipped, unless linked_files.
+        """
+        linked = shared = 0
+        for path in paths:
+            for filepath in sorted(Path(path).iterdir()):
+                if not filepath.is_file() or filepath.suffix in _SKIPPED_SUFFIXES:
+                    continue
+                if filepath.stat().st_nlink > 1 and not linked_files:
+                    continue
+                if self.ingest(filepath):
+                    linked += 1
+                    if (stat := filepath.stat()).st_nlink > 2:
+                        shared += stat.st_size
+        return linked, shared
+
+    # _____________________________________________________________________________
+    def prune(self, base_paths: Iterable[PathLike], keep_days: int, dry_run: bool = False) -> list[Path]:
+        """Remove dated folders older than keep_days, always keeping the latest of each base folder"""
+        cutoff = date.today() - timedelta(days=keep_days)
+        removed = []
+        for base_path in base_paths:
+            if not Path(base_path).is_dir():
+                continue
+            folders = sorted((d, x) for x in Path(base_path).iterdir() if x.is_dir() and (d := _folder_date(x)))
+            for folder_date, folder in folders[:-1]:
+                if folder_date < cutoff:
+                    _logger.info(f'Remove "{folder}"')
+                    if not dry_run:
+                        shutil.rmtree(folder)
+                    removed.append(folder)
+        return removed
+
+    # _____________________________________________________________________________
+    def gc(self, dry_run: bool = False) -> tuple[int, int]:
+        """Remove blobs no longer linked from any folder, returning (blobs removed, bytes freed)"""
+        count = freed = 0
+        if not self._store_path.is_dir():
+            return count, freed
+        for blob_filepath in self._store_path.glob('*/*'):
+            if (stat := blob_filepath.stat()).st_nlink == 1:
+                if not dry_run:
+                    blob_filepath.unlink()
+                count += 1
+                freed += stat.st_size
+        return count, freed
+
+    # _____________________________________________________________________________
+    @property
+    def store_path(self):
+        return self._store_path
+
+
+# _____________________________________________________________________________
+def parse_args(args=None) -> argparse.Namespace:
+    base_path = Path(__file__).parents[1]
+    arg_parser = argparse.ArgumentParser(description='Prune dated output folders and unused blobs')
+    arg_parser.add_argument('--output', type=Path, default=Path(base_path, 'output'),
+                            help='output folder')
+    arg_parser.add_argument('--keep-days', type=int, default=None,
+                            help='remove dated plot and data frame folders older than this many days '
+                                 '(default: keep all)')
+    arg_parser.add_argument('--ingest', action='store_true',
+                            help='first link files of all dated folders with blobs, sharing identical files')
+    arg_parser.add_argument('--dry-run', action='store_true',
+                            help='report what would be removed without removing it')
+    return arg_parser.parse_args(args)
+
+
+# _____________________________________________________________________________
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    store = BlobStore(Path(args.output, 'blobs'))
+    base_paths = [Path(args.output, 'plots'), Path(args.output, 'dataframes')]
+    dated_folders = [x for base_path in base_paths if base_path.is_dir()
+                     for x in sorted(base_path.iterdir()) if x.is_dir() and _folder_date(x)]
+
+    if args.ingest and not args.dry_run:
+        linked, shared = store.ingest_folders(dated_folders, linked_files=True)
+        _logger.info(f'Linked {linked} files, {shared:,} bytes shared')
+    if args.keep_days is not None:
+        removed = store.prune(base_paths, args.keep_days, args.dry_run)
+        _logger.info(f'Removed {len(removed)} dated folders')
+    count, freed = store.gc(args.dry_run)
+    _logger.info(f'Removed {count} unused blobs, {freed:,} bytes')
+
+
+# _____________________________________________________________________________
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import dataclasses
+import datetime
+import hashlib
+import json
+import logging.handlers
+import os
+from pathlib import Path
+import shutil
+from typing import Optional
+
+from appUtils import replace_file
+from configParser import ConfigPlot
+from frameCache import FrameCache
+from lazyChart import PLOTLYJS_FILENAME
+
+_logger = logging.getLogger(__name__)
+_MANIFEST_VERSION = 1
+
+
+# _____________________________________________________________________________
+def _config_repr(obj) -> str:
+    """Stable text of a configuration object, excluding position in the configuration file"""
+    if dataclasses.is_dataclass(obj):
+        items = [f'{f.name}={_config_repr(getattr(obj, f.name))}' for f in dataclasses.fields(obj) if f.name != 'idx']
+        return f'{type(obj).__name__}({", ".join(items)})'
+    elif isinstance(obj, (list, tuple)):
+        return f'[{", ".join(_config_repr(x) for x in obj)}]'
+    elif isinstance(obj, dict):
+        return f'{{{", ".join(f"{k!r}: {_config_repr(v)}" for k, v in sorted(obj.items()))}}}'
+    elif isinstance(obj, (datetime.date, datetime.datetime)):
+        return obj.isoformat()
+    return repr(obj)
+
+
+# _____________________________________________________________________________
+def link_file(src: Path, dst: Path):
+    """Hard link file, falling back to copy where links are not supported"""
+    if dst.exists():
+        if dst.samefile(src):
+            return
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+# _____________________________________________________________________________
+class BuildManifest:
+    """Records fingerprint and output files of each plot built
+
+    A plot fingerprint covers its configuration entry and the content of all
+    its input files, so a plot need only be rebuilt when its fingerprint changes.
+    """
+
+    # _____________________________________________________________________________
+    def __init__(self, filepath: Path):
+        self._filepath = Path(filepath).resolve()
+        self._entries: dict[str, dict] = {}
+        # Folders plotly.js has been linked into
+        self._asset_paths: set[Path] = set()
+
+        if self._filepath.exists():
+            try:
+                data = json.loads(self._filepath.read_text())
+                if data.get('version') == _MANIFEST_VERSION:
+                    self._entries = data.get('plots', {})
+            except (OSError, ValueError):
+                _logger.warning(f'Manifest unreadable, rebuilding all plots: "{self._filepath.name}"')
+
+    # _____________________________________________________________________________
+    @staticmethod
+    def fingerprint(plot_config: ConfigPlot, input_paths: list[Path], frame_cache: FrameCache,
+                    **options) -> Optional[str]:
+        """Fingerprint of plot configuration, build options and input file content
+
+        Returns None if an input file cannot be read so the plot is always rebuilt.
+        """
+        h = hashlib.sha256()
+        h.update(_config_repr(plot_config).encode())
+        h.update(_config_repr(options).encode())
+        for path in input_paths:
+            try:
+                h.update(frame_cache.digest(path).encode())
+            except OSError:
+                return None
+        return h.hexdigest()
+
+    # _____________________________________________________________________________
+    def reuse(self, plot_config: ConfigPlot, fingerprint: Optional[str], output_paths: list[Path]) -> bool:
+        """Provide outputs of previous build if fingerprint is unchanged
+
+        Outputs built on a previous day are hard linked into today's folders.
+        """
+        if fingerprint is None:
+            return False
+        entry = self._entries.get(plot_config.filename)
+        if not entry or entry.get('fingerprint') != fingerprint:
+            return False
+
+        previous_paths = [Path(x) for x in entry.get('outputs', [])]
+        if len(previous_paths) != len(output_paths) or not all(x.exists() for x in previous_paths):
+            return False
+
+        for src, dst in zip(previous_paths, output_paths):
+            if src != dst:
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                link_file(src, dst)
+                # Html output references plotly.js written alongside it; sidecars are outputs themselves
+                if dst.suffix == '.html' and dst.parent not in self._asset_paths:
+                    if (asset := Path(src.parent, PLOTLYJS_FILENAME)).exists():
+                        if not (dst_asset := Path(dst.parent, PLOTLYJS_FILENAME)).exists():
+                            link_file(asset, dst_asset)
+                        self._asset_paths.add(dst.parent)
+        # Latest outputs are linked from, so earlier dated folders can be pruned
+        entry['outputs'] = [str(x) for x in output_paths]
+        return True
+
+    # _____________________________________________________________________________
+    def update(self, plot_config: ConfigPlot, fingerprint: Optional[str], output_paths: list[Path]):
+        if fingerprint is None:
+            self.discard(plot_config)
+        else:
+            self._entries[plot_config.filename] = {'fingerprint': fingerprint,
+                                                   'outputs': [str(x) for x in output_paths]}
+
+    # _____________________________________________________________________________
+    def discard(self, plot_config: ConfigPlot):
+        self._entries.pop(plot_config.filename, None)
+
+    # _____________________________________________________________________________
+    def save(self):
+        data = {'version': _MANIFEST_VERSION, 'plots': self._entries}
+        with replace_file(self._filepath) as tmp_filepath:
+            tmp_filepath.write_text(json.dumps(data, indent=2, sort_keys=True))
@@ -2,60 +2,117 @@ from __future__ import annotations
 import datetime
 from dataclasses import dataclass
 from dateutil import parser
-import jsonschema as js
+import hashlib
 import logging.handlers
 from os import PathLike
 from pathlib import Path
-import yaml
+import pickle
+from typing import Optional
+
+from appUtils import replace_file
+from instrumentation import span
 
 _logger = logging.getLogger(__name__)
 
+# Validators by schema hash, built once per process
+_validators = {}
+
+# Default view title suffix of derived series
+_SERIES_TITLES = {'rebased': 'Rebased', 'drawdown': 'Drawdown', 'rollingReturn': '{0.rolling_days} day return'}
+
+# Traces with more points than this are drawn with WebGL, unless a plot sets its own limit
+WEBGL_POINTS = 10_000
+
 
 # _____________________________________________________________________________
 @dataclass
 class ConfigCsvFile:
-    __slots__ = ['idx', 'filename', 'code', 'fields']
+    __slots__ = ['idx', 'filename', 'code', 'fields', 'date_format', 'resample']
 
     idx: int
     filename: str
     code: str
     fields: dict[str, str]
+    date_format: str
+    resample: Optional[ConfigResample]
 
     # _____________________________________________________________________________
-    def __init__(self, filename, code, fields, idx):
+    def __init__(self, filename, code, fields, idx, date_format=None, resample=None):
         self.idx = idx
         self.filename = filename
         self.code = code
         self.fields = fields
+        self.date_format = date_format
+        self.resample = resample
+
+
+# _____________________________________________________________________________
+@dataclass
+class ConfigResample:
+    __slots__ = ['interval', 'bars']
+
+    interval: str
+    bars: str
+
+    # _____________________________________________________________________________
+    def __init__(self, item):
+        self.interval = item['interval']
+        self.bars = item.get('bars', 'last')
+
+
+# _____________________________________________________________________________
+@dataclass
+class ConfigDownsample:
+    __slots__ = ['method', 'points']
+
+    method: str
+    points: int
+
+    # _____________________________________________________________________________
+    def __init__(self, item):
+        self.method = item.get('method', 'lttb')
+        self.points = item['points']
 
 
 # _____________________________________________________________________________
 @dataclass
 class ConfigPlotView:
-    __slots__ = ['idx', 'start_date', 'title']
+    __slots__ = ['idx', 'start_date', 'title', 'downsample', 'series', 'rolling_days']
 
     idx: int
     start_date: datetime.datetime
     title: str
+    downsample: Optional[ConfigDownsample]
+    series: str
+    rolling_days: int
 
     # _____________________________________________________________________________
-    def __init__(self, item, idx):
+    def __init__(self, item, idx, downsample=None):
         self.idx = idx
         self.start_date = parser.parse(item['startDate']) if 'startDate' in item else None
+        self.series = item.get('series', 'raw')
+        self.rolling_days = item.get('rollingDays', 252)
         self.title = item.get('title', '')
         if not self.title and self.start_date:
             self.title = f'Start date: {self.start_date:%d-%b-%y}'
+        if 'title' not in item and self.series != 'raw':
+            self.title = ' - '.join(filter(None, [self.title, _SERIES_TITLES[self.series].format(self)]))
+        # View setting overrides plot setting
+        self.downsample = ConfigDownsample(item['downsample']) if 'downsample' in item else downsample
 
 
 # _____________________________________________________________________________
 @dataclass
 class ConfigPlot:
-    __slots__ = ['idx', 'tag', 'filename', 'csv_files', 'views']
+    __slots__ = ['idx', 'tag', 'filename', 'layout', 'webgl_points', 'csv_files', 'downsample', 'views']
 
     idx: int
     tag: str
     filename: str
+    layout: str
+    webgl_points: int
     csv_files: list[ConfigCsvFile]
+    downsample: Optional[ConfigDownsample]
     views: list[ConfigPlotView]
 
     # _____________________________________________________________________________
@@ -63,10 +120,13 @@ class ConfigPlot:
         self.idx = idx
         self.tag = item.get('tag', '')
         self.filename = item['output']['filename']
+        self.layout = item['output'].get('layout', 'subplots')
+        self.webgl_points = item['output'].get('webglPoints', WEBGL_POINTS)
 
         _logger.debug(f'{self.tag}:{idx} - output "{self.filename}"')
         self.csv_files = ConfigPlot.__parse_csv_files(item.get('csvFiles'), self.tag) if 'csvFiles' in item else []
-        self.views = [ConfigPlotView(x, i) for i, x in enumerate(item['views'])]
+        self.downsample = ConfigDownsample(item['downsample']) if 'downsample' in item else None
+        self.views = [ConfigPlotView(x, i, self.downsample) for i, x in enumerate(item['views'])]
 
     # _____________________________________________________________________________
     @staticmethod
@@ -79,36 +139,94 @@ class ConfigPlot:
                 filename = data['filename']
                 code = data.get('code', '')
                 fields = data.get('fields', None)
+                date_format = data.get('dateFormat', None)
+                resample = ConfigResample(data['resample']) if 'resample' in data else None
                 _logger.debug(f'{tag}:{i} - byFile {code} "{filename}"')
-                csv_files.append(ConfigCsvFile(filename, code, fields, i))
+                csv_files.append(ConfigCsvFile(filename, code, fields, i, date_format, resample))
             elif 'byCodes' in x:
                 data = x['byCodes']
                 fields = data.get('fields', None)
+                date_format = data.get('dateFormat', None)
+                resample = ConfigResample(data['resample']) if 'resample' in data else None
                 for code in data.get('yahooCodes', []):
                     filename = f'{code}.csv'
                     _logger.debug(f'{tag}:{i} - byCodes {code} "{filename}"')
-                    csv_files.append(ConfigCsvFile(filename, code, fields, i))
+                    csv_files.append(ConfigCsvFile(filename, code, fields, i, date_format, resample))
 
         return csv_files
 
 
+# _____________________________________________________________________________
+def _load_yaml(text: str):
+    import yaml
+
+    # C loader where libyaml is available is many times faster
+    return yaml.load(text, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+
+# _____________________________________________________________________________
+def _validator(schema_hash: str, data_schema: dict):
+    import jsonschema as js
+
+    if (validator := _validators.get(schema_hash)) is None:
+        cls = js.validators.validator_for(data_schema)
+        cls.check_schema(data_schema)
+        validator = _validators[schema_hash] = cls(data_schema)
+    return validator
+
+
 # _____________________________________________________________________________
 class ConfigParser:
+    """Parse and validate plots configuration
+
+    Parsed configuration is cached in a pickle keyed by the content of the
+    configuration, its schema and this module, so an unchanged configuration
+    is neither parsed nor validated again.
+    """
+
     # _____________________________________________________________________________
     @staticmethod
-    def parse(path: PathLike) -> list[ConfigPlot]:
+    def parse(path: PathLike, cache_path: Optional[PathLike] = None) -> list[ConfigPlot]:
         filename = Path(path).resolve()
         schema_filename = filename.with_suffix('.schema.yaml').resolve()
         _logger.debug(f'config filename: {filename}')
         _logger.debug(f'schema filename: {schema_filename}')
 
+        with span('config_parse') as sp:
+            text, schema_text = filename.read_bytes(), schema_filename.read_bytes()
+            schema_hash = hashlib.sha256(schema_text).hexdigest()
+            key = hashlib.sha256(b'\0'.join([text, schema_text, Path(__file__).read_bytes()])).hexdigest()[:32]
+            cache_filepath = Path(cache_path, f'{filename.stem}.{key}.pickle') if cache_path else None
+            if cache_filepath and cache_filepath.exists():
+                try:
+                    entries = pickle.loads(cache_filepath.read_bytes())
+                    _logger.debug(f'Config cache hit: "{cache_filepath.name}"')
+                    sp.set(cached=True, plots=len(entries))
+                    return entries
+                except Exception:
+                    _logger.warning(f'Config cache entry unreadable: "{cache_filepath.name}"')
+
+            entries = ConfigParser._parse(filename, text.decode(), schema_text.decode(), schema_hash)
+            if cache_filepath:
+                ConfigParser._store(cache_filepath, filename.stem, entries)
+            sp.set(cached=False, plots=len(entries))
+            return entries
+
+    # _____________________________________________________________________________
+    @staticmethod
+    def _parse(filename: Path, text: str, schema_text: str, schema_hash: str) -> list[ConfigPlot]:
+        import jsonschema as js
+        import yaml
+
         try:
-            data = yaml.safe_load(filename.read_text())
-            data_schema = yaml.safe_load(schema_filename.read_text())
-            js.validate(instance=data, schema=data_schema)
+            data = _load_yaml(text)
+            data_schema = _load_yaml(schema_text)
+            error = js.exceptions.best_match(_validator(schema_hash, data_schema).iter_errors(data))
+            if error is not None:
+                raise error
             entries = [ConfigPlot(x, i) for i, x in enumerate(data['plots'])]
         except yaml.YAMLError as ex:
-            _logger.exception(f'Parse rrror in: "{filename.name}"')
+            _logger.exception(f'Parse error in: "{filename.name}"')
             raise
         except js.SchemaError as ex:
             _logger.exception(f'Schema error in: "{filename.name}" {ex.message}')
@@ -117,3 +235,15 @@ class ConfigParser:
             _logger.exception(f'Validation error in: "{filename.name}" {ex.message}')
             raise
         return entries
+
+    # _____________________________________________________________________________
+    @staticmethod
+    def _store(cache_filepath: Path, stem: str, entries: list[ConfigPlot]):
+        cache_filepath.parent.mkdir(parents=True, exist_ok=True)
+        for stale in cache_filepath.parent.glob(f'{stem}.*.pickle'):
+            if stale != cache_filepath:
+                stale.unlink(missing_ok=True)
+
+        # Write then rename so partially written files are never read
+        with replace_file(cache_filepath) as tmp_filepath:
+            tmp_filepath.write_bytes(pickle.dumps(entries, protocol=pickle.HIGHEST_PROTOCOL))
@@ -0,0 +1,205 @@
+"""Dashboard page of all plots, sharing one payload of series data
+
+Each distinct trace series is stored once in a data script beside the page,
+as base64 encoded typed arrays: dates as Float64 milliseconds (shared by
+series with equal dates) and prices as Float32.  Plots reference series by
+content hash, so a series used by many plots or views (eg a benchmark
+index) is written once, and views with a start date take a slice of the
+series in the browser rather than a copy.  Downsampled views are the
+exception: their series are sliced to the view's dates before downsampling,
+so each view has its full point budget as on the plot's own page.  Each view
+is drawn when it scrolls into view.
+
+Derived series are calculated over each plot's frame as for its own page,
+so they are shared where their values are equal.
+"""
+from __future__ import annotations
+import base64
+import hashlib
+import json
+import logging.handlers
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from appConfig import AppConfig
+from appUtils import replace_file
+from configParser import ConfigPlot
+from dataLoader import load_plot_data
+from frameCache import FrameCache
+from instrumentation import span
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_logger = logging.getLogger(__name__)
+
+DASHBOARD_FILENAME = 'dashboard.html'
+_DATA_FILENAME = 'dashboard.data.js'
+
+_PAGE = '''<html>
+<head><meta charset="utf-8" /><title>Dashboard</title>
+<script src="{plotlyjs}"></script>
+<script src="{data}"></script>
+<style>
+body {{ font-family: sans-serif; }}
+.view {{ height: 450px; }}
+</style>
+</head>
+<body>
+<nav>{nav}</nav>
+{sections}
+<script>
+const plots = {plots};
+const arrays = {{}};
+
+function decode(id, b64, Type) {{
+    if (!(id in arrays)) {{
+        const text = atob(b64);
+        const bytes = new Uint8Array(text.length);
+        for (let i = 0; i < text.length; i++) bytes[i] = text.charCodeAt(i);
+        arrays[id] = new Type(bytes.buffer);
+    }}
+    return arrays[id];
+}}
+
+function trace(t, start, webglPoints) {{
+    const s = plotterData.series[t.series];
+    let x = decode('d' + s.dates, plotterData.dates[s.dates], Float64Array);
+    let y = decode(t.series, s.values, Float32Array);
+    if (start !== null) {{
+        let lo = 0, hi = x.length;
+        while (lo < hi) {{ const mid = (lo + hi) >> 1; if (x[mid] < start) lo = mid + 1; else hi = mid; }}
+        x = x.subarray(lo);
+        y = y.subarray(lo);
+    }}
+    return {{name: t.name, x: x, y: y, mode: 'lines', line: {{color: t.color}},
+             type: webglPoints && x.length > webglPoints ? 'scattergl' : 'scatter'}};
+}}
+
+function draw(div) {{
+    const plot = plots[div.dataset.plot];
+    const view = plot.views[div.dataset.view];
+    const data = view.traces.map(function (t) {{ return trace(t, view.start, plot.webglPoints); }});
+    Plotly.newPlot(div, data, {{title: {{text: view.title}}, xaxis: {{type: 'date'}}}},
+                   {{displaylogo: false, responsive: true}});
+}}
+
+const observer = new IntersectionObserver(function (entries) {{
+    for (const entry of entries) {{
+        if (!entry.isIntersecting) continue;
+        observer.unobserve(entry.target);
+        draw(entry.target);
+    }}
+}}, {{rootMargin: '200px'}});
+document.querySelectorAll('.view').forEach(function (x) {{ observer.observe(x); }});
+</script>
+</body>
+</html>
+'''
+
+
+# _____________________________________________________________________________
+class _Payload:
+    """Distinct date and price arrays, base64 encoded by content hash"""
+
+    # _____________________________________________________________________________
+    def __init__(self):
+        self.dates: dict[str, str] = {}
+        self.series: dict[str, dict] = {}
+
+    # _____________________________________________________________________________
+    @staticmethod
+    def _hash(*data: bytes) -> str:
+        h = hashlib.sha1()
+        for x in data:
+            h.update(x)
+        return h.hexdigest()[:16]
+
+    # _____________________________________________________________________________
+    def add(self, series: pd.Series) -> str:
+        """Add series unless already held, returning its id"""
+        import numpy as np
+
+        dates = series.index.as_unit('ms').asi8.astype(np.float64).tobytes()
+        values = series.to_numpy(dtype=np.float32).tobytes()
+        dates_id = self._hash(dates)
+        series_id = self._hash(dates_id.encode(), values)
+        if series_id not in self.series:
+            if dates_id not in self.dates:
+                self.dates[dates_id] = base64.b64encode(dates).decode('ascii')
+            self.series[series_id] = {'dates': dates_id, 'values': base64.b64encode(values).decode('ascii')}
+        return series_id
+
+
+# _____________________________________________________________________________
+def _plot_spec(plot_config: ConfigPlot, df: pd.DataFrame, payload: _Payload) -> dict:
+    """Views of plot, their traces referencing series in payload"""
+    import pandas as pd
+    import plotly as py
+    from derivedSeries import DerivedSeries, trace_data
+
+    colors = py.colors.qualitative.Plotly
+    derived = DerivedSeries(df)
+    views = []
+    for i, cv in enumerate(plot_config.views, start=1):
+        if cv.downsample:
+            dfs, start = derived.view(cv), None
+        else:
+            dfs = derived.series(cv)
+            start = pd.Timestamp(cv.start_date).value // 1_000_000 if cv.start_date else None
+        traces = []
+        for j, col in enumerate(dfs.columns):
+            _, y = trace_data(dfs[col], cv.downsample)
+            # Blanks from joining series on different dates are not part of a series
+            traces.append({'name': col, 'series': payload.add(y.dropna()), 'color': colors[j % len(colors)]})
+        views.append({'title': cv.title or f'View {i}', 'start': start, 'traces': traces})
+    return {'tag': plot_config.tag, 'filename': plot_config.filename, 'webglPoints': plot_config.webgl_points,
+            'views': views}
+
+
+# _____________________________________________________________________________
+def _write(filepath: Path, text: str) -> int:
+    with replace_file(filepath) as tmp_filepath:
+        tmp_filepath.write_text(text, encoding='utf-8')
+    return filepath.stat().st_size
+
+
+# _____________________________________________________________________________
+def write_dashboard(plot_configs: list[ConfigPlot], app_config: AppConfig,
+                    frame_cache: FrameCache = None) -> Path:
+    """Write dashboard page and its data script to plot folder, returning path of page"""
+    from html import escape
+    from lazyChart import write_plotlyjs
+
+    payload = _Payload()
+    plots, nav, sections = [], [], []
+    with span('dashboard', plots=len(plot_configs)) as sp:
+        for plot_config in plot_configs:
+            try:
+                df = load_plot_data(plot_config, app_config, frame_cache)
+            except Exception:
+                _logger.exception(f'{plot_config.tag}:{plot_config.idx} - not in dashboard "{plot_config.filename}"')
+                continue
+            if df is None:
+                continue
+            k = len(plots)
+            plots.append(_plot_spec(plot_config, df, payload))
+            title = escape(plot_config.tag or plot_config.filename)
+            nav.append(f'<a href="#plot{k}">{title}</a>')
+            divs = [f'<div class="view" data-plot="{k}" data-view="{i}"></div>'
+                    for i in range(len(plot_config.views))]
+            sections.append(f'<section id="plot{k}"><h2>{title}</h2>\n' + '\n'.join(divs) + '\n</section>')
+
+        plot_path = Path(app_config.plot_path)
+        data_bytes = _write(Path(plot_path, _DATA_FILENAME),
+                            f'const plotterData = {json.dumps({"dates": payload.dates, "series": payload.series})};\n')
+        dashboard_filepath = Path(plot_path, DASHBOARD_FILENAME)
+        # Plot specs are json in a script element, so must not close it
+        plots_json = json.dumps(plots).replace('</', '<\\/')
+        page_bytes = _write(dashboard_filepath,
+                            _PAGE.format(plotlyjs=write_plotlyjs(plot_path), data=_DATA_FILENAME,
+                                         nav=' | '.join(nav), sections='\n'.join(sections), plots=plots_json))
+        sp.set(series=len(payload.series), dates=len(payload.dates), bytes=data_bytes + page_bytes)
+    _logger.info(f'Dashboard: {len(plots)} plots, {len(payload.series)} distinct series, '
+                 f'{data_bytes + page_bytes:,} bytes "{dashboard_filepath}"')
+    return dashboard_filepath
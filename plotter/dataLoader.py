@@ -1,26 +1,71 @@
+from __future__ import annotations
 import logging.handlers
-import pandas as pd
 from pathlib import Path
-
+from typing import Optional, TYPE_CHECKING
 
 from appConfig import AppConfig
 from configParser import ConfigPlot
-from dataParser import CsvParser, DataSource
+from frameCache import FrameCache
+from instrumentation import span
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 _logger = logging.getLogger(__name__)
 
+# Data types of prices held in memory; int32 holds prices as fixed point nullable integers,
+# 4 bytes of value and 1 byte of mask per price, so 5/8 the memory of float64 where float32 takes half
+FRAME_DTYPES = ['float64', 'float32', 'int32']
+# Sources of price data: csv files, or the price store imported from them
+DATA_SOURCES = ['csv', 'store']
+# Decimal places prices are rounded to, and of fixed point int32 prices
+PRICE_DECIMALS = 4
+
+
+# _____________________________________________________________________________
+def plot_input_paths(config_plot: ConfigPlot, app_config: AppConfig) -> list[Path]:
+    return [Path(app_config.data_path, cf.filename) for cf in config_plot.csv_files]
+
 
 # _____________________________________________________________________________
-def load_plot_data(config_plot: ConfigPlot, app_config: AppConfig) -> pd.DataFrame:
+def load_plot_data(config_plot: ConfigPlot, app_config: AppConfig,
+                   frame_cache: Optional[FrameCache] = None) -> pd.DataFrame:
+    from dataParser import CsvParser, DataSource, StoreParser
+    from priceStore import PriceStore
+
     _logger.debug('load_plot_data')
 
     data_sources, df = [], None
-    for cf in config_plot.csv_files:
-        filepath = Path(app_config.data_path, cf.filename)
-        data_sources.append(DataSource(cf.code, filepath, cf.fields))
+    for cf, filepath in zip(config_plot.csv_files, plot_input_paths(config_plot, app_config)):
+        data_sources.append(DataSource(cf.code, filepath, cf.fields, cf.date_format, cf.resample))
 
     if data_sources:
-        parser = CsvParser()
-        df = parser.parses(data_sources)
-        df.round(decimals=2)
+        with span('load_plot_data', dtype=app_config.frame_dtype) as sp:
+            if app_config.data_source == 'store':
+                parser = StoreParser(PriceStore(app_config.price_store_path))
+            else:
+                parser = CsvParser(frame_cache, app_config.read_threads, app_config.read_buffer_bytes)
+            df = parser.parses(data_sources, dtype=app_config.frame_dtype, decimals=PRICE_DECIMALS)
+            nbytes = int(df.memory_usage(index=True, deep=False).sum())
+            sp.set(rows=len(df), columns=len(df.columns), frameBytes=nbytes)
+        _logger.debug(f'{config_plot.tag}:{config_plot.idx} - frame {len(df):,} x {len(df.columns)} '
+                      f'{app_config.frame_dtype}: {nbytes:,} bytes')
     return df
+
+
+# _____________________________________________________________________________
+def sync_price_store(plot_configs: list[ConfigPlot], app_config: AppConfig) -> int:
+    """Import input files of plots into price store where changed, returning number imported"""
+    from priceStore import PriceStore
+
+    sources = {}
+    for config_plot in plot_configs:
+        for cf, filepath in zip(config_plot.csv_files, plot_input_paths(config_plot, app_config)):
+            # Resampled files are streamed rather than imported, being too large to load whole
+            if filepath.exists() and not cf.resample:
+                sources[filepath] = cf.date_format
+    with span('store_sync', files=len(sources)) as sp:
+        count = PriceStore(app_config.price_store_path).sync(sources.items())
+        sp.set(imported=count)
+    _logger.info(f'Price store: {count} of {len(sources)} files imported')
+    return count
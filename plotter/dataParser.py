@@ -1,22 +1,127 @@
 from abc import ABC, abstractmethod
+from contextlib import closing
 from dataclasses import dataclass
+import io
 from os import PathLike
 import logging.handlers
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
+
+from configParser import ConfigResample
+from dateParsing import parse_date_column
+from frameCache import FrameCache
+from instrumentation import span
+from prefetch import DEFAULT_MAX_BYTES, DEFAULT_READS, prefetch
+from priceStore import PriceStore
+from resampling import bar_columns, read_resampled_csv
 
 _logger = logging.getLogger(__name__)
 
+# Frame attribute holding scale of fixed point prices
+PRICE_SCALE_ATTR = 'priceScale'
+_INT32_MAX = np.iinfo(np.int32).max
+
 
 # _____________________________________________________________________________
 @dataclass
 class DataSource:
-    __slots__ = ['code', 'filepath', 'fields']
+    __slots__ = ['code', 'filepath', 'fields', 'date_format', 'resample']
 
     code: str
     filepath: PathLike
     fields: dict[str: str]
+    date_format: Optional[str]
+    resample: Optional[ConfigResample]
+
+
+# _____________________________________________________________________________
+def float_prices(obj: Union[pd.Series, pd.DataFrame]) -> Union[pd.Series, pd.DataFrame]:
+    """Prices as floats, converting fixed point prices of int32 frames to float64"""
+    if (scale := obj.attrs.get(PRICE_SCALE_ATTR)) is None:
+        return obj
+    return obj.astype('float64') / scale
+
+
+# _____________________________________________________________________________
+def assemble_frame(columns: dict[str, pd.Series], dtype: str = 'float64', decimals: Optional[int] = None) -> pd.DataFrame:
+    """Frame of series on the sorted union of their dates
+
+    Values are copied once, straight into a single array of dtype, rather than
+    aligned series by series.  Values are rounded to decimals in place; int32
+    frames hold values scaled by 10 ** decimals (default 4) as nullable
+    integers, 5 bytes per value with the mask of missing values, falling back
+    to float32 if a value would overflow.
+    """
+    index = None
+    for series in columns.values():
+        index = series.index if index is None or index.equals(series.index) else index.union(series.index)
+
+    # Positions of each series in the frame, looking dates up only where series dates differ from the frame's
+    positions, unsorted = np.arange(len(index)), index
+    if not index.is_monotonic_increasing:
+        order = index.argsort()
+        index = index[order]
+        positions[order] = np.arange(len(index))
+    positions = [positions if x.index.equals(unsorted) else index.get_indexer(x.index) for x in columns.values()]
+    shape = (len(index), len(columns))
+
+    if dtype == 'int32':
+        decimals = 4 if decimals is None else decimals
+        scale = 10 ** decimals
+        if max((np.nanmax(np.abs(x.to_numpy(dtype=np.float64)), initial=0) for x in columns.values())) * scale < _INT32_MAX:
+            values = np.zeros(shape, dtype=np.int32, order='F')
+            mask = np.ones(shape, dtype=bool, order='F')
+            for j, (series, pos) in enumerate(zip(columns.values(), positions)):
+                v = series.to_numpy(dtype=np.float64)
+                present = ~np.isnan(v)
+                values[pos[present], j] = np.rint(v[present] * scale)
+                mask[pos[present], j] = False
+            df = pd.DataFrame({name: pd.arrays.IntegerArray(values[:, j], mask[:, j]) for j, name in enumerate(columns)},
+                              index=index, copy=False)
+            df.attrs[PRICE_SCALE_ATTR] = scale
+            return df
+        _logger.warning(f'Prices too large for int32 with {decimals} decimals, using float32')
+        dtype = 'float32'
+
+    # Column major so each column is contiguous and the frame wraps the array without copying
+    values = np.full(shape, np.nan, dtype=dtype, order='F')
+    for j, (series, pos) in enumerate(zip(columns.values(), positions)):
+        values[pos, j] = series.to_numpy()
+    if decimals is not None:
+        np.round(values, decimals, out=values)
+    return pd.DataFrame(values, index=index, columns=list(columns), copy=False)
+
+
+# _____________________________________________________________________________
+def _column_name(code: str, key: str) -> str:
+    return code if key == 'Exit' else f'{code}|{key}'
+
+
+# _____________________________________________________________________________
+def _source_columns(ds: DataSource, dff: pd.DataFrame) -> dict[str, pd.Series]:
+    """Frame columns of requested fields of a parsed file, by frame column name"""
+    columns = {}
+    for key, value in ds.fields.items():
+        if key == 'Date':
+            continue
+        for bar_key, bar_value in bar_columns(key, value, ds.resample) if ds.resample else [(key, value)]:
+            df_column_name = _column_name(ds.code, bar_key)
+            _logger.debug(f'Parsing {ds.code}: column "{df_column_name}" <-- "{bar_value}"')
+            columns[df_column_name] = dff[bar_value]
+    return columns
+
+
+# _____________________________________________________________________________
+def _frame(columns: dict[str, pd.Series], dtype: str, decimals: Optional[int]) -> pd.DataFrame:
+    if not columns:
+        return pd.DataFrame()
+    with span('frame_assembly', columns=len(columns), dtype=dtype) as sp:
+        df = assemble_frame(columns, dtype, decimals)
+        df.index.name = 'Date'
+        sp.set(rows=len(df))
+    return df
 
 
 # _____________________________________________________________________________
@@ -45,40 +150,120 @@ class DataParser(ABC):
 
 # _____________________________________________________________________________
 class CsvParser(DataParser):
+    """Parser of csv files, read ahead of parsing on a pool of threads (see prefetch)"""
+
     # _____________________________________________________________________________
-    def __init__(self):
+    def __init__(self, frame_cache: Optional[FrameCache] = None, max_reads: int = DEFAULT_READS,
+                 max_read_bytes: int = DEFAULT_MAX_BYTES):
         super().__init__('CsvParser')
+        self._frame_cache = frame_cache
+        self._max_reads = max_reads
+        self._max_read_bytes = max_read_bytes
 
     # _____________________________________________________________________________
-    def parses(self, data_sources: list[DataSource], /, **kwargs) -> pd.DataFrame:
+    def parses(self, data_sources: list[DataSource], /, dtype: str = 'float64', decimals: Optional[int] = None,
+               **kwargs) -> pd.DataFrame:
+        """Frame of requested columns of all files on their combined dates, see assemble_frame"""
         _logger.debug(f'Parser {self.parser_name}: {len(data_sources)} files')
 
-        df = pd.DataFrame()
+        # Load only requested columns of csv file
+        params = []
         for ds in data_sources:
-            filepath = Path(ds.filepath)
-            fields = ds.fields
-            _logger.debug(f'Parsing {ds.code}: "{filepath.name}"')
-
-            # Load csv file
-            date_col = fields.get('Date', 'Date')
-            _logger.debug(f'Parsing {ds.code}: index column "{date_col}"')
-            dff = pd.read_csv(str(filepath), index_col=date_col, parse_dates=True)
-
-            # Copy columns
-            for key in fields.keys():
-                if key == 'Date':
-                    continue
-                df_column_name = ds.code if key == 'Exit' else f'{ds.code}|{key}'
-                _logger.debug(f'Parsing {ds.code}: column "{df_column_name}" <-- "{fields[key]}"')
-                df[df_column_name] = dff[fields[key]]
-
-            # Rename index label (if needed)
-            if value := fields.get('Date', ''):
-                _logger.debug(f'Parsing {ds.code}: index "Date" <-- "{value}"')
-                df.index.rename('Date', inplace=True)
+            date_col = ds.fields.get('Date', 'Date')
+            value_cols = list(dict.fromkeys(v for k, v in ds.fields.items() if k != 'Date'))
+            cache_params = (date_col, tuple(value_cols), ds.date_format)
+            if ds.resample:
+                cache_params += (ds.resample.interval, ds.resample.bars)
+            params.append((date_col, value_cols, cache_params))
 
-        df.sort_index(inplace=True)
-        return df
+        # Files whose frames are cached are not read, the rest are read ahead of parsing
+        reads = {i for i, (ds, (_, _, cache_params)) in enumerate(zip(data_sources, params))
+                 if self._frame_cache is None or not self._frame_cache.contains(ds.filepath, *cache_params)}
+        read_filepaths = [Path(ds.filepath) for i, ds in enumerate(data_sources) if i in reads]
+
+        # Collect series then join once, as inserting columns one at a time re-aligns every insert
+        columns = {}
+        with closing(prefetch(read_filepaths, self._max_reads, self._max_read_bytes)) as contents:
+            for i, (ds, (date_col, value_cols, cache_params)) in enumerate(zip(data_sources, params)):
+                filepath = Path(ds.filepath)
+                _logger.debug(f'Parsing {ds.code}: "{filepath.name}" index column "{date_col}"')
+                with span('csv_load', file=filepath.name) as sp:
+                    data = next(contents)[1] if i in reads else None
+                    dff = self._read_csv(filepath, date_col, value_cols, ds, cache_params, data)
+                    sp.set(rows=len(dff), bytes=None if data is None else len(data))
+                columns.update(_source_columns(ds, dff))
+
+        return _frame(columns, dtype, decimals)
+
+    # _____________________________________________________________________________
+    def _read_csv(self, filepath: Path, date_col: str, value_cols: list[str], ds: DataSource, cache_params: tuple,
+                  data: Optional[bytes] = None) -> pd.DataFrame:
+        date_format = ds.date_format
+
+        def loader(path: Path) -> pd.DataFrame:
+            if ds.resample:
+                return read_resampled_csv(data if data is not None else path, date_col, value_cols, date_format,
+                                          ds.resample)
+
+            source = io.BytesIO(data) if data is not None else str(path)
+            dtype = dict.fromkeys(value_cols, 'float64')
+            if date_format:
+                return pd.read_csv(source, index_col=date_col, usecols=[date_col, *value_cols], dtype=dtype,
+                                   parse_dates=[date_col], date_format=date_format)
+
+            # Infer date format from a sample then parse whole column with it
+            dtype[date_col] = str
+            dff = pd.read_csv(source, index_col=date_col, usecols=[date_col, *value_cols], dtype=dtype)
+            dff.index = parse_date_column(dff.index, dayfirst=True).rename(date_col)
+            return dff
+
+        if self._frame_cache is None:
+            return loader(filepath)
+        return self._frame_cache.load(filepath, loader, *cache_params, data=data)
+
+
+# _____________________________________________________________________________
+class StoreParser(DataParser):
+    """Parser of series from the memory mapped price store rather than csv text
+
+    Series wrap the store's arrays without copying; the only copy made is
+    into the plot's frame.
+    """
+
+    # _____________________________________________________________________________
+    def __init__(self, store: PriceStore):
+        super().__init__('StoreParser')
+        self._store = store
+
+    # _____________________________________________________________________________
+    def parses(self, data_sources: list[DataSource], /, dtype: str = 'float64', decimals: Optional[int] = None,
+               **kwargs) -> pd.DataFrame:
+        _logger.debug(f'Parser {self.parser_name}: {len(data_sources)} files')
+        self._store.refresh()
+
+        columns = {}
+        for ds in data_sources:
+            filename = Path(ds.filepath).name
+            if ds.resample:
+                # Files too large to load whole are not imported to the store but streamed
+                with span('csv_load', file=filename) as sp:
+                    date_col = ds.fields.get('Date', 'Date')
+                    value_cols = list(dict.fromkeys(v for k, v in ds.fields.items() if k != 'Date'))
+                    dff = read_resampled_csv(Path(ds.filepath), date_col, value_cols, ds.date_format, ds.resample)
+                    sp.set(rows=len(dff))
+                columns.update(_source_columns(ds, dff))
+                continue
+
+            with span('store_load', file=filename) as sp:
+                for key, value in ds.fields.items():
+                    if key == 'Date':
+                        continue
+                    dates, values = self._store.load(filename, value)
+                    index = pd.DatetimeIndex(dates, copy=False)
+                    columns[_column_name(ds.code, key)] = pd.Series(values, index=index, copy=False)
+                    sp.set(rows=len(index))
+
+        return _frame(columns, dtype, decimals)
 
 
 # _____________________________________________________________________________
@@ -91,11 +276,16 @@ class CsvYahooParser(DataParser):
     def parses(self, data_sources: list[DataSource], /, **kwargs) -> pd.DataFrame:
         _logger.debug(f'Parser {self.parser_name}: {len(data_sources)} files')
 
-        df = pd.DataFrame()
+        columns = {}
         for data_source in data_sources:
             filepath = Path(data_source.filepath)
             _logger.debug(f'Parser {self.parser_name}: "{filepath.name}"')
-            dff = pd.read_csv(str(filepath), index_col='Date', parse_dates=True)
-            df[data_source.code] = dff['Adj Close']
+            dff = pd.read_csv(str(filepath), index_col='Date', usecols=['Date', 'Adj Close'],
+                              dtype={'Adj Close': 'float64'}, parse_dates=['Date'], date_format='%Y-%m-%d')
+            columns[data_source.code] = dff['Adj Close']
+
+        if not columns:
+            return pd.DataFrame()
+        df = pd.concat(columns, axis=1, join='outer')
         df.sort_index(inplace=True)
         return df
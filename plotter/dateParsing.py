@@ -0,0 +1,133 @@
+"""Date parsing with format inference, shared by preprocessors and data parsers
+
+The format of a file's dates is inferred once from a sample of its values.
+Values are then parsed with that fixed format, either one at a time through a
+memoized DateParser or a whole column at once with parse_date_column.  Values
+not matching the format fall back to dateutil.
+
+This module imports nothing from the plotter folder so it can be imported both
+as a sibling module and as plotter.dateParsing.
+"""
+from datetime import datetime
+from dateutil import parser
+import logging
+from typing import Iterable, Optional
+
+_logger = logging.getLogger(__name__)
+
+# Candidate formats in order of preference; day first formats precede month first
+# formats when dayfirst, so ambiguous samples (eg 01/02/2020) resolve as expected
+_FORMATS_COMMON = ['%Y-%m-%d', '%Y%m%d', '%Y/%m/%d', '%d-%b-%y', '%d-%b-%Y', '%d %b %Y', '%d %B %Y',
+                   '%b %d, %Y', '%B %d, %Y', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S']
+_FORMATS_DAYFIRST = ['%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%d-%m-%y']
+_FORMATS_MONTHFIRST = ['%m/%d/%Y', '%m-%d-%Y', '%m/%d/%y', '%m-%d-%y']
+
+_CACHE_MAX_SIZE = 1 << 16
+
+
+# _____________________________________________________________________________
+def candidate_formats(dayfirst: bool = False) -> list[str]:
+    if dayfirst:
+        return _FORMATS_COMMON + _FORMATS_DAYFIRST + _FORMATS_MONTHFIRST
+    return _FORMATS_COMMON + _FORMATS_MONTHFIRST + _FORMATS_DAYFIRST
+
+
+# _____________________________________________________________________________
+def infer_format(samples: Iterable[str], dayfirst: bool = False) -> Optional[str]:
+    """First candidate format parsing all samples, or None if there is none"""
+    samples = [x.strip() for x in samples if x and x.strip()]
+    if not samples:
+        return None
+
+    for fmt in candidate_formats(dayfirst):
+        try:
+            for x in samples:
+                datetime.strptime(x, fmt)
+            return fmt
+        except ValueError:
+            continue
+    return None
+
+
+# _____________________________________________________________________________
+class DateParser:
+    """Memoized parser of date text for values from one source
+
+    The format is given, inferred with infer(), or inferred from the first
+    value parsed.
+    """
+
+    # _____________________________________________________________________________
+    def __init__(self, fmt: Optional[str] = None, dayfirst: bool = False):
+        self._format = fmt
+        self._dayfirst = dayfirst
+        self._inferred = fmt is not None
+        self._cache: dict[str, datetime] = {}
+        self._fallbacks = 0
+
+    # _____________________________________________________________________________
+    def infer(self, samples: Iterable[str]) -> Optional[str]:
+        self._format = infer_format(samples, self._dayfirst)
+        self._inferred = True
+        _logger.debug(f'Date format inferred: {self._format}')
+        return self._format
+
+    # _____________________________________________________________________________
+    def __call__(self, text: str) -> datetime:
+        if (value := self._cache.get(text)) is not None:
+            return value
+
+        if not self._inferred:
+            self.infer([text])
+        try:
+            value = datetime.strptime(text.strip(), self._format) if self._format else None
+        except ValueError:
+            value = None
+        if value is None:
+            self._fallbacks += 1
+            value = parser.parse(text, dayfirst=self._dayfirst)
+
+        if len(self._cache) < _CACHE_MAX_SIZE:
+            self._cache[text] = value
+        return value
+
+    # _____________________________________________________________________________
+    @property
+    def format(self):
+        return self._format
+
+    # _____________________________________________________________________________
+    @property
+    def fallbacks(self):
+        """Number of values parsed by dateutil as they did not match the format"""
+        return self._fallbacks
+
+
+# _____________________________________________________________________________
+def parse_date_column(values, fmt: Optional[str] = None, dayfirst: bool = False, sample_size: int = 20):
+    """Parse a column of date text with one vectorized conversion, returning a DatetimeIndex
+
+    Format is inferred from a sample of values if not given.  Values not matching
+    the format are parsed individually by dateutil.
+    """
+    import numpy as np
+    import pandas as pd
+
+    values = pd.Index(values, dtype=object)
+    if fmt is None:
+        step = max(1, len(values) // sample_size)
+        fmt = infer_format((x for x in values[::step] if isinstance(x, str)), dayfirst)
+    if fmt is None:
+        dates = pd.to_datetime(values, format='mixed', dayfirst=dayfirst)
+    else:
+        dates = pd.to_datetime(values, format=fmt, errors='coerce')
+
+    # Fall back for present values that did not match
+    if len(missed := np.flatnonzero(dates.isna() & values.notna())):
+        _logger.debug(f'Date format {fmt}: {len(missed)} values parsed by dateutil')
+        fallback = DateParser(None, dayfirst)
+        fallback.infer([])
+        dates = dates.to_numpy(copy=True)
+        dates[missed] = [np.datetime64(fallback(values[i])) for i in missed]
+        dates = pd.DatetimeIndex(dates)
+    return dates
@@ -0,0 +1,152 @@
+"""Series derived from a plot's prices, computed once and shared by its views
+
+Derived series are computed over the whole frame at once, column wise with
+cumulative operations, then each view takes a slice:
+- rebased: log prices are computed once; rebasing at a view's start date is
+  a subtraction of the log price of each column's first price in the view
+- drawdown: running peak by cumulative maximum
+- rollingReturn: difference of log prices N rows apart
+
+Prices are forward filled within each series so gaps from joining series
+on different trading days do not break the calculations; derived values
+are blank wherever the price is blank.
+"""
+from __future__ import annotations
+import logging.handlers
+from typing import Optional, TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from configParser import ConfigDownsample, ConfigPlotView
+from dataParser import float_prices
+from downsample import downsample
+
+if TYPE_CHECKING:
+    import datetime
+
+_logger = logging.getLogger(__name__)
+
+
+# _____________________________________________________________________________
+class DerivedSeries:
+    """Derived series of one plot's frame, each computed on first use"""
+
+    # _____________________________________________________________________________
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+        self._cache: dict[tuple, object] = {}
+
+    # _____________________________________________________________________________
+    def _memo(self, key: tuple, func):
+        if (value := self._cache.get(key)) is None:
+            value = self._cache[key] = func()
+        return value
+
+    # _____________________________________________________________________________
+    def _prices(self) -> np.ndarray:
+        """Float prices forward filled within each series, with blanks where a price is blank"""
+        def compute():
+            df = float_prices(self._df)
+            filled = df.ffill().to_numpy(dtype=np.float64, na_value=np.nan)
+            return filled, df.isna().to_numpy()
+        return self._memo(('prices',), compute)
+
+    # _____________________________________________________________________________
+    def _log_prices(self) -> np.ndarray:
+        def compute():
+            filled, _ = self._prices()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.log(filled)
+        return self._memo(('log',), compute)
+
+    # _____________________________________________________________________________
+    def _next_valid(self) -> np.ndarray:
+        """Row of first price at or after each row, by column; number of rows where there is none"""
+        def compute():
+            _, blank = self._prices()
+            n = len(blank)
+            rows = np.where(blank, n, np.arange(n)[:, None])
+            return np.minimum.accumulate(rows[::-1], axis=0)[::-1]
+        return self._memo(('nextValid',), compute)
+
+    # _____________________________________________________________________________
+    def _frame(self, values: np.ndarray) -> pd.DataFrame:
+        _, blank = self._prices()
+        values = np.where(blank, np.nan, values)
+        return pd.DataFrame(values, index=self._df.index, columns=self._df.columns, copy=False)
+
+    # _____________________________________________________________________________
+    def rebased(self, start_date: datetime.datetime = None) -> pd.DataFrame:
+        """Prices rebased to 100 at each column's first price on or after start date"""
+        def compute():
+            log = self._log_prices()
+            start = int(self._df.index.searchsorted(start_date)) if start_date is not None else 0
+            first = self._next_valid()[start] if start < len(log) else np.full(log.shape[1], len(log))
+            base = np.full(log.shape[1], np.nan)
+            present = first < len(log)
+            base[present] = log[first[present], np.flatnonzero(present)]
+            return self._frame(100 * np.exp(log - base))
+        return self._memo(('rebased', start_date), compute)
+
+    # _____________________________________________________________________________
+    def drawdown(self) -> pd.DataFrame:
+        """Percentage fall from running peak price"""
+        def compute():
+            filled, _ = self._prices()
+            peak = np.fmax.accumulate(filled, axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return self._frame(100 * (filled / peak - 1))
+        return self._memo(('drawdown',), compute)
+
+    # _____________________________________________________________________________
+    def rolling_return(self, days: int) -> pd.DataFrame:
+        """Percentage return over days rows"""
+        def compute():
+            log = self._log_prices()
+            values = np.full(log.shape, np.nan)
+            values[days:] = 100 * np.expm1(log[days:] - log[:-days])
+            return self._frame(values)
+        return self._memo(('rollingReturn', days), compute)
+
+    # _____________________________________________________________________________
+    def series(self, cv: ConfigPlotView) -> pd.DataFrame:
+        """Series of view over all dates"""
+        if cv.series == 'rebased':
+            return self.rebased(cv.start_date)
+        elif cv.series == 'drawdown':
+            return self.drawdown()
+        elif cv.series == 'rollingReturn':
+            return self.rolling_return(cv.rolling_days)
+        return self._df
+
+    # _____________________________________________________________________________
+    def view(self, cv: ConfigPlotView) -> pd.DataFrame:
+        """Series of view, sliced from its start date"""
+        df = self.series(cv)
+        return df.loc[cv.start_date:] if cv.start_date else df
+
+
+# _____________________________________________________________________________
+def series_key(cv: ConfigPlotView) -> tuple:
+    """Views with equal keys plot the same series, so can share traces"""
+    if cv.series == 'rebased':
+        return cv.series, cv.start_date
+    if cv.series == 'rollingReturn':
+        return cv.series, cv.rolling_days
+    return cv.series,
+
+
+# _____________________________________________________________________________
+def trace_data(series: pd.Series, ds: Optional[ConfigDownsample]) -> tuple[pd.Index, pd.Series]:
+    """Trace points of series, downsampled if configured"""
+    series = float_prices(series)
+    if ds is None:
+        return series.index, series
+
+    series = series.dropna()
+    if len(series) <= ds.points:
+        return series.index, series
+    idx = downsample(series.index.asi8, series.to_numpy(dtype=np.float64), ds.method, ds.points)
+    _logger.debug(f'downsample {ds.method}: {len(series)} --> {len(idx)} points')
+    return series.index[idx], series.iloc[idx]
@@ -0,0 +1,84 @@
+"""Reduce points of a series for plotting while preserving its visual shape
+
+Both algorithms return indices of the points kept, always including the first
+and last points, in ascending order.
+"""
+import logging.handlers
+import numpy as np
+
+_logger = logging.getLogger(__name__)
+
+METHODS = ('lttb', 'minmax')
+
+
+# _____________________________________________________________________________
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest triangle three buckets
+
+    Interior points are split into n_out - 2 buckets.  From each bucket the
+    point forming the largest triangle with the previous selected point and
+    the average of the next bucket is kept.  Bucket averages use prefix sums
+    and the per bucket search is vectorized; only the chain of selections is
+    sequential.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    x = x - x[0]
+
+    # Bucket [starts[k], ends[k]) for interior points 1 .. n - 2
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+
+    # Average of each bucket from prefix sums, next bucket of the last is the last point
+    cs_x = np.concatenate(([0.0], np.cumsum(x)))
+    cs_y = np.concatenate(([0.0], np.cumsum(y)))
+    counts = ends - starts
+    next_x = np.append(((cs_x[ends] - cs_x[starts]) / counts)[1:], x[-1])
+    next_y = np.append(((cs_y[ends] - cs_y[starts]) / counts)[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for k in range(n_out - 2):
+        s, e = starts[k], ends[k]
+        area = np.abs((x[a] - next_x[k]) * (y[s:e] - y[a]) - (x[a] - x[s:e]) * (next_y[k] - y[a]))
+        a = s + int(np.argmax(area))
+        selected[k + 1] = a
+    return selected
+
+
+# _____________________________________________________________________________
+def min_max(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Minimum and maximum of each bucket
+
+    Points are split into (n_out - 2) // 2 equal width buckets and the lowest and
+    highest point of each bucket are kept, so peaks and troughs are never lost.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    n_buckets = (n_out - 2) // 2
+    bucket = (np.arange(n) * n_buckets) // n
+
+    # Sort by value within bucket; first and last of each bucket are its minimum and maximum
+    order = np.lexsort((y, bucket))
+    bounds = np.flatnonzero(np.diff(bucket[order], prepend=-1, append=n_buckets))
+    mins = order[bounds[:-1]]
+    maxs = order[bounds[1:] - 1]
+    return np.unique(np.concatenate(([0, n - 1], mins, maxs)))
+
+
+# _____________________________________________________________________________
+def downsample(x: np.ndarray, y: np.ndarray, method: str, n_out: int) -> np.ndarray:
+    """Indices of points to keep using named method"""
+    if method == 'lttb':
+        return lttb(x, y, n_out)
+    elif method == 'minmax':
+        return min_max(x, y, n_out)
+    raise ValueError(f'Unknown downsample method "{method}"')
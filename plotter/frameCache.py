@@ -0,0 +1,179 @@
+from __future__ import annotations
+from collections import OrderedDict
+import hashlib
+import logging.handlers
+from os import PathLike
+from pathlib import Path
+from typing import Callable, Iterable, Optional, TYPE_CHECKING
+
+from appUtils import replace_file
+from prefetch import DEFAULT_MAX_BYTES, DEFAULT_READS, prefetch
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_logger = logging.getLogger(__name__)
+_DIGEST_BLOCK_SIZE = 1 << 20
+_DEFAULT_MAX_BYTES = 512 << 20
+
+
+# _____________________________________________________________________________
+class FrameCache:
+    """Two tier cache of parsed data frames keyed by input file content
+
+    Memory tier is least recently used within a byte budget.  Disk tier holds
+    pickled, date indexed frames so unchanged files are not parsed again
+    between runs.
+    """
+
+    # _____________________________________________________________________________
+    def __init__(self, cache_path: Path, max_bytes: int = _DEFAULT_MAX_BYTES):
+        self._cache_path = Path(cache_path).resolve()
+        self._cache_path.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._frames: OrderedDict[str, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._digests: dict[Path, tuple[int, int, str]] = {}
+        _logger.debug(f'cache path "{self._cache_path}"  budget {max_bytes:,} bytes')
+
+    # _____________________________________________________________________________
+    def _known_digest(self, filepath: Path) -> Optional[str]:
+        """Content hash of file if known and file unchanged since"""
+        try:
+            stat = filepath.stat()
+        except OSError:
+            return None
+        if (entry := self._digests.get(filepath)) and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            return entry[2]
+        return None
+
+    # _____________________________________________________________________________
+    def contains(self, filepath: PathLike, *params) -> bool:
+        """Whether frame for file is cached and known current without reading the file (see load)"""
+        filepath = Path(filepath).resolve()
+        if (digest := self._known_digest(filepath)) is None:
+            return False
+        key = self._key(filepath, params, digest)
+        return key in self._frames or Path(self._cache_path, f'{key}.pickle').exists()
+
+    # _____________________________________________________________________________
+    def digest_all(self, filepaths: Iterable[PathLike], max_reads: int = DEFAULT_READS,
+                   max_bytes: int = DEFAULT_MAX_BYTES):
+        """Find content hashes of files not known, reading files in parallel (see prefetch)"""
+        unknown = {Path(x).resolve() for x in filepaths}
+        unknown = sorted(x for x in unknown if self._known_digest(x) is None)
+        for filepath, data in prefetch(unknown, max_reads, max_bytes):
+            if data is not None:
+                self.digest(filepath, data)
+
+    # _____________________________________________________________________________
+    def known_digests(self, filepaths: Iterable[PathLike]) -> dict[Path, tuple[int, int, str]]:
+        """(Size, modification time, content hash) of files whose hash is known, eg to send to workers"""
+        resolved = (Path(x).resolve() for x in filepaths)
+        return {x: entry for x in resolved if (entry := self._digests.get(x))}
+
+    # _____________________________________________________________________________
+    def add_digests(self, digests: dict[Path, tuple[int, int, str]]):
+        """Add content hashes found elsewhere (see known_digests); each is used only while its file is unchanged"""
+        self._digests.update(digests)
+
+    # _____________________________________________________________________________
+    def digest(self, filepath: PathLike, data: Optional[bytes] = None) -> str:
+        """Content hash of file, recomputed only when size or modification time change
+
+        Content already read may be given as data so the file is not read again.
+        """
+        filepath = Path(filepath).resolve()
+        stat = filepath.stat()
+        if (entry := self._digests.get(filepath)) and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            return entry[2]
+
+        # Hash of content already read may not match stat taken after it, but is then recomputed next run
+        h = hashlib.sha256()
+        if data is not None:
+            h.update(data)
+        else:
+            with filepath.open(mode='rb') as fp:
+                while block := fp.read(_DIGEST_BLOCK_SIZE):
+                    h.update(block)
+        digest = h.hexdigest()
+        self._digests[filepath] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    # _____________________________________________________________________________
+    def load(self, filepath: PathLike, loader: Callable[[Path], pd.DataFrame], *params,
+             data: Optional[bytes] = None) -> pd.DataFrame:
+        """Return frame for file, calling loader only if not cached in memory or on disk
+
+        Parameters that change how the file is parsed (eg index column) must be
+        passed in params as they form part of the cache key.  Content of the
+        file already read may be given as data (see digest).
+        """
+        filepath = Path(filepath).resolve()
+        key = self._key(filepath, params, self.digest(filepath, data))
+        path_key = key.partition('.')[0]
+
+        # Memory tier
+        if entry := self._frames.get(key):
+            self._frames.move_to_end(key)
+            _logger.debug(f'Cache hit memory: "{filepath.name}"')
+            return entry[0]
+
+        # Disk tier
+        cache_filepath = Path(self._cache_path, f'{key}.pickle')
+        df = None
+        if cache_filepath.exists():
+            try:
+                import pandas as pd
+                df = pd.read_pickle(cache_filepath)
+                _logger.debug(f'Cache hit disk: "{filepath.name}"')
+            except Exception:
+                _logger.warning(f'Cache entry unreadable: "{cache_filepath.name}"')
+
+        # Parse and store
+        if df is None:
+            _logger.debug(f'Cache miss: "{filepath.name}"')
+            df = loader(filepath)
+            self._store(path_key, cache_filepath, df)
+
+        self._remember(key, df)
+        return df
+
+    # _____________________________________________________________________________
+    @staticmethod
+    def _key(filepath: Path, params: tuple, digest: str) -> str:
+        path_key = hashlib.sha256(repr((str(filepath), params)).encode()).hexdigest()[:32]
+        return f'{path_key}.{digest[:32]}'
+
+    # _____________________________________________________________________________
+    def _store(self, path_key: str, cache_filepath: Path, df: pd.DataFrame):
+        # Remove entries for previous versions of the file
+        for stale in self._cache_path.glob(f'{path_key}.*.pickle'):
+            if stale != cache_filepath:
+                stale.unlink(missing_ok=True)
+
+        # Write then rename so partially written files are never read
+        with replace_file(cache_filepath) as tmp_filepath:
+            df.to_pickle(tmp_filepath)
+
+    # _____________________________________________________________________________
+    def _remember(self, key: str, df: pd.DataFrame):
+        nbytes = int(df.memory_usage(index=True, deep=False).sum())
+        if nbytes > self._max_bytes:
+            return
+
+        self._frames[key] = (df, nbytes)
+        self._bytes += nbytes
+        while self._bytes > self._max_bytes:
+            _, (_, evicted_bytes) = self._frames.popitem(last=False)
+            self._bytes -= evicted_bytes
+
+    # _____________________________________________________________________________
+    @property
+    def cache_path(self):
+        return self._cache_path
+
+    # _____________________________________________________________________________
+    @property
+    def memory_bytes(self):
+        return self._bytes
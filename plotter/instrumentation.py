@@ -0,0 +1,133 @@
+"""Timing and memory instrumentation of a run, written as a json report
+
+Stages are wrapped in spans recording wall time plus counts set by the
+stage (rows, points, bytes).  Spans are recorded against the plot being
+processed (see plot_record), otherwise against the run (see run_record).
+Spans outside both are not recorded, so long running callers (eg the
+server) do not accumulate them.  Plot records are plain dicts so they pass
+back from worker processes.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import logging.handlers
+import os
+from pathlib import Path
+import sys
+import time
+import tracemalloc
+from typing import Iterator, Optional
+
+from appUtils import replace_file
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+_logger = logging.getLogger(__name__)
+_REPORT_VERSION = 2
+REPORT_FILENAME = 'run-report.json'
+
+# Spans of the run while there is one, and of the plot being processed, otherwise of the run
+_run_spans: Optional[list[dict]] = None
+_spans: Optional[list[dict]] = None
+
+
+# _____________________________________________________________________________
+class Span:
+    __slots__ = ['name', 'attrs']
+
+    # _____________________________________________________________________________
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+
+    # _____________________________________________________________________________
+    def set(self, **attrs):
+        """Set counts of work done in span, eg rows=, points=, bytes="""
+        self.attrs.update(attrs)
+
+
+# _____________________________________________________________________________
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Span]:
+    s = Span(name, attrs)
+    spans = _spans
+    start = time.perf_counter()
+    try:
+        yield s
+    finally:
+        if spans is not None:
+            spans.append({'name': name, 'seconds': round(time.perf_counter() - start, 6), **s.attrs})
+
+
+# _____________________________________________________________________________
+def _max_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+# _____________________________________________________________________________
+@contextmanager
+def run_record() -> Iterator[list[dict]]:
+    """Record spans of a run outside of plot records, yielding them for write_report
+
+    A run recorded within another is part of it, so a caller may include its
+    own stages (eg parsing configuration) in the run.
+    """
+    global _run_spans, _spans
+
+    if _run_spans is not None:
+        yield _run_spans
+        return
+    prev_spans = _spans
+    _run_spans = _spans = []
+    try:
+        yield _run_spans
+    finally:
+        _run_spans, _spans = None, prev_spans
+
+
+# _____________________________________________________________________________
+@contextmanager
+def plot_record(idx: int, tag: str, filename: str, trace_memory: bool = False) -> Iterator[dict]:
+    """Record spans of processing a plot, its wall time and memory
+
+    With trace_memory the peak of memory allocated by Python while processing
+    the plot is traced; this slows processing noticeably.  Peak RSS of the
+    process so far is always recorded as processMaxRssBytes.  It is not per
+    plot: it only grows, so a plot processed after a larger one in the same
+    process reports the larger peak.
+    """
+    global _spans
+
+    record = {'idx': idx, 'tag': tag, 'filename': filename, 'pid': os.getpid(), 'spans': []}
+    prev_spans, _spans = _spans, record['spans']
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = round(time.perf_counter() - start, 6)
+        if trace_memory:
+            record['peakTracedBytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        record['processMaxRssBytes'] = _max_rss_bytes()
+        _spans = prev_spans
+
+
+# _____________________________________________________________________________
+def write_report(filepath: Path, run_spans: list[dict], plot_records: list[dict], **run_attrs):
+    """Write run spans and plot records as json, slowest plots first"""
+    report = {'version': _REPORT_VERSION, 'created': datetime.now().isoformat(timespec='seconds'), **run_attrs,
+              'processMaxRssBytes': _max_rss_bytes(), 'spans': run_spans,
+              'plots': sorted(plot_records, key=lambda x: x.get('seconds', 0), reverse=True)}
+    with replace_file(filepath) as tmp_filepath:
+        tmp_filepath.write_text(json.dumps(report, indent=2, default=str))
+    _logger.info(f'Run report: "{filepath}"')
@@ -0,0 +1,87 @@
+"""Html chart whose views are loaded only when scrolled into view
+
+Each view's figure is written as a sidecar script beside the page, which
+adds a script element for a view when its placeholder nears the viewport.
+Sidecars are scripts, not json fetched by the page, as browsers block
+fetch from pages opened from file:// urls.  Plotly.js is shared by all
+pages in the folder as with include_plotlyjs='directory'.
+"""
+from __future__ import annotations
+import json
+import logging.handlers
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from appUtils import replace_file
+
+if TYPE_CHECKING:
+    import plotly.graph_objs as go
+
+_logger = logging.getLogger(__name__)
+
+PLOTLYJS_FILENAME = 'plotly.min.js'
+
+_PAGE = '''<html>
+<head><meta charset="utf-8" /><title>{title}</title>
+<script src="{plotlyjs}"></script>
+<style>.view {{ height: 500px; }}</style>
+</head>
+<body>
+{views}
+<script>
+window.plotterView = function (id, figure) {{
+    Plotly.newPlot(id, figure.data, figure.layout, {{displaylogo: false, responsive: true}});
+}};
+const observer = new IntersectionObserver(function (entries) {{
+    for (const entry of entries) {{
+        if (!entry.isIntersecting) continue;
+        observer.unobserve(entry.target);
+        const script = document.createElement('script');
+        script.src = entry.target.dataset.src;
+        document.body.appendChild(script);
+    }}
+}}, {{rootMargin: '200px'}});
+document.querySelectorAll('.view').forEach(function (x) {{ observer.observe(x); }});
+</script>
+</body>
+</html>
+'''
+
+
+# _____________________________________________________________________________
+def write_plotlyjs(path: Path) -> str:
+    """Write plotly.js to folder unless there, returning its file name for pages in the folder"""
+    # Written once per folder, as plotly does for include_plotlyjs='directory'
+    plotlyjs_filepath = Path(path, PLOTLYJS_FILENAME)
+    if not plotlyjs_filepath.exists():
+        from plotly.offline import get_plotlyjs
+        plotlyjs_filepath.write_text(get_plotlyjs(), encoding='utf-8')
+    return PLOTLYJS_FILENAME
+
+
+# _____________________________________________________________________________
+def sidecar_filepaths(output_filepath: Path, views: int) -> list[Path]:
+    """Figure script of each view of chart"""
+    return [output_filepath.with_name(f'{output_filepath.stem}.view{i}.js') for i in range(1, views + 1)]
+
+
+# _____________________________________________________________________________
+def write_lazy_chart(figures: list[go.Figure], output_filepath: Path, title: str = '') -> int:
+    """Write page and a sidecar per view figure, returning bytes written"""
+    from html import escape
+
+    plotlyjs = write_plotlyjs(output_filepath.parent)
+    total = 0
+    divs = []
+    for i, (fig, filepath) in enumerate(zip(figures, sidecar_filepaths(output_filepath, len(figures))), start=1):
+        view_id = f'view{i}'
+        with replace_file(filepath) as tmp_filepath:
+            tmp_filepath.write_text(f'plotterView({json.dumps(view_id)}, {fig.to_json()});\n', encoding='utf-8')
+        total += filepath.stat().st_size
+        divs.append(f'<div class="view" id="{view_id}" data-src="{escape(filepath.name)}"></div>')
+
+    with replace_file(output_filepath) as tmp_filepath:
+        tmp_filepath.write_text(_PAGE.format(title=escape(title), plotlyjs=plotlyjs, views='\n'.join(divs)),
+                                encoding='utf-8')
+    _logger.debug(f'Lazy chart: {len(figures)} views')
+    return total + output_filepath.stat().st_size
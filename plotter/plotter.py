@@ -1,70 +1,457 @@
+from __future__ import annotations
+import argparse
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import nullcontext
+import cProfile
 import logging.handlers
+import multiprocessing
+import signal
 import time
+import traceback
 from datetime import datetime, timedelta
-from decimal import Decimal
-from io import StringIO
 from pathlib import Path
-
-import pandas as pd
-import plotly as py
-import plotly.graph_objs as go
-import plotly.subplots as ps
+from typing import Optional, TYPE_CHECKING
 
 from appConfig import AppConfig
-from configParser import ConfigPlot, ConfigPlotView
-from dataLoader import load_plot_data
+from appUtils import configure_logging, init_worker_logging, replace_file
+from blobStore import BlobStore
+from buildManifest import BuildManifest
+from configParser import WEBGL_POINTS, ConfigDownsample, ConfigPlot, ConfigPlotView
+from dataLoader import DATA_SOURCES, FRAME_DTYPES, load_plot_data, plot_input_paths, sync_price_store
+from frameCache import FrameCache
+from instrumentation import REPORT_FILENAME, plot_record, run_record, span, write_report
+from snapshot import SNAPSHOT_FORMATS, snapshot_filepath, write_snapshot
+
+# numpy, pandas and plotly take most of start up time so are imported only when a plot is built
+if TYPE_CHECKING:
+    import pandas as pd
+    import plotly.graph_objs as go
 
 _logger = logging.getLogger(__name__)
-lh_file = logging.FileHandler(Path(__file__).with_suffix('.log'), mode='wt')
-lh_file.setLevel(logging.DEBUG)
-lh_console = logging.StreamHandler()
-lh_console.setLevel(logging.INFO)
-logging.basicConfig(level=logging.DEBUG, handlers=[lh_file, lh_console])
-logging.captureWarnings(True)
 
-FIXED_PLACES = Decimal('.0001')
+# Per worker process state (see _init_worker)
+_worker_frame_cache = None
+
+
+# _____________________________________________________________________________
+def _scatter(webgl_points: int, **kwargs) -> go.Scatter | go.Scattergl:
+    """Line trace, drawn with WebGL when it has more than webgl_points points as SVG becomes slow"""
+    import plotly.graph_objs as go
+
+    if webgl_points and len(kwargs['x']) > webgl_points:
+        return go.Scattergl(mode='lines', **kwargs)
+    return go.Scatter(mode='lines', **kwargs)
 
 
 # _____________________________________________________________________________
-def plot_chart(df: pd.DataFrame, tag: str, config_views: list[ConfigPlotView], output_filepath: Path):
-    _logger.debug('plot_chart')
+def _add_view_traces(fig: go.Figure, dff: pd.DataFrame, tag: str, i: int, cv: ConfigPlotView,
+                     webgl_points: int, **position):
+    """Add a trace per column of view's data, to subplot at position if given"""
+    import plotly as py
+    from derivedSeries import trace_data
 
     colors = py.colors.qualitative.Plotly
+    with span('trace_build', view=cv.title or f'View {i}') as sp:
+        points = 0
+        for j, col in enumerate(dff.columns):
+            _logger.debug(f'{tag}:{i} - column "{col}"')
+            color = colors[j % len(colors)]
+            x, y = trace_data(dff[col], cv.downsample)
+            fig.add_trace(_scatter(webgl_points, name=col, x=x, y=y, line={'color': color}), **position)
+            points += len(x)
+        sp.set(traces=len(dff.columns), points=points)
+
+
+# _____________________________________________________________________________
+def _subplots_figure(df: pd.DataFrame, tag: str, config_views: list[ConfigPlotView],
+                     webgl_points: int = WEBGL_POINTS) -> go.Figure:
+    """Figure with a subplot per view, each holding its own copy of the data"""
+    import plotly.subplots as ps
+    from derivedSeries import DerivedSeries
+
     subplot_titles = [cv.title for cv in config_views]
     fig = ps.make_subplots(rows=len(config_views), cols=1, subplot_titles=subplot_titles)
+    derived = DerivedSeries(df)
 
     # Plot
     for i, cv in enumerate(config_views, start=1):
         _logger.debug(f'{tag}:{i} - title "{cv.title}"')
-        dff = df.loc[cv.start_date:] if cv.start_date else df
-        for j, col in enumerate(df.columns):
-            _logger.debug(f'{tag}:{i} - column "{col}"')
-            color = colors[j % len(colors)]
-            fig.add_trace(go.Scatter(name=col, x=dff.index, y=dff[col],
-                                     mode='lines', line={'color': color}),
-                          row=i, col=1)
+        _add_view_traces(fig, derived.view(cv), tag, i, cv, webgl_points, row=i, col=1)
+    return fig
+
+
+# _____________________________________________________________________________
+def _view_figures(df: pd.DataFrame, tag: str, config_views: list[ConfigPlotView],
+                  webgl_points: int = WEBGL_POINTS) -> list[go.Figure]:
+    """Figure per view, for charts loading each view separately"""
+    import plotly.graph_objs as go
+    from derivedSeries import DerivedSeries
+
+    derived = DerivedSeries(df)
+    figures = []
+    for i, cv in enumerate(config_views, start=1):
+        _logger.debug(f'{tag}:{i} - title "{cv.title}"')
+        fig = go.Figure()
+        _add_view_traces(fig, derived.view(cv), tag, i, cv, webgl_points)
+        fig.update_layout(title_text=cv.title)
+        figures.append(fig)
+    return figures
+
+
+# _____________________________________________________________________________
+def _shared_figure(df: pd.DataFrame, tag: str, config_views: list[ConfigPlotView],
+                   ds: Optional[ConfigDownsample], webgl_points: int = WEBGL_POINTS) -> go.Figure:
+    """Figure holding each series once, with a button per view setting the axis ranges
+
+    Views of derived series hold a set of traces for each distinct series,
+    shown by the view's button.
+    """
+    import numpy as np
+    import plotly as py
+    import plotly.graph_objs as go
+    from dataParser import float_prices
+    from derivedSeries import DerivedSeries, series_key, trace_data
+
+    colors = py.colors.qualitative.Plotly
+    fig = go.Figure()
+    derived = DerivedSeries(df)
+
+    # Plot a trace set per distinct series of views
+    trace_sets = {}
+    with span('trace_build', view='shared') as sp:
+        points = 0
+        for cv in config_views:
+            if (key := series_key(cv)) in trace_sets:
+                continue
+            dfs = derived.series(cv)
+            trace_sets[key] = range(len(fig.data), len(fig.data) + len(dfs.columns))
+            for j, col in enumerate(dfs.columns):
+                _logger.debug(f'{tag} - column "{col}" {key[0]}')
+                color = colors[j % len(colors)]
+                x, y = trace_data(dfs[col], ds)
+                # Only the first set is shown until a view is selected
+                fig.add_trace(_scatter(webgl_points, name=col, x=x, y=y, line={'color': color},
+                                       visible=None if len(trace_sets) == 1 else False))
+                points += len(x)
+        sp.set(traces=len(fig.data), points=points)
+
+    # Views as axis ranges over shared data; y range fitted to data visible in view
+    buttons = []
+    for i, cv in enumerate(config_views, start=1):
+        _logger.debug(f'{tag}:{i} - title "{cv.title}"')
+        dff = derived.view(cv)
+        if dff.empty:
+            continue
+        y_min = np.nanmin(float_prices(dff.min()).to_numpy(dtype=np.float64, na_value=np.nan))
+        y_max = np.nanmax(float_prices(dff.max()).to_numpy(dtype=np.float64, na_value=np.nan))
+        y_pad = (y_max - y_min) * 0.05 or abs(y_max) * 0.05 or 1.0
+        relayout = {'xaxis.range': [dff.index[0], dff.index[-1]],
+                    'yaxis.range': [y_min - y_pad, y_max + y_pad],
+                    'title.text': cv.title}
+        if len(trace_sets) == 1:
+            buttons.append({'label': cv.title or f'View {i}', 'method': 'relayout', 'args': [relayout]})
+        else:
+            visible = [j in trace_sets[series_key(cv)] for j in range(len(fig.data))]
+            buttons.append({'label': cv.title or f'View {i}', 'method': 'update',
+                            'args': [{'visible': visible}, relayout]})
+
+    if buttons:
+        initial = buttons[0]['args'][-1]
+        if len(trace_sets) > 1:
+            for trace, visible in zip(fig.data, buttons[0]['args'][0]['visible']):
+                trace.visible = visible
+        fig.update_layout(title_text=initial['title.text'],
+                          xaxis_range=initial['xaxis.range'], yaxis_range=initial['yaxis.range'],
+                          updatemenus=[{'type': 'buttons', 'direction': 'right', 'buttons': buttons,
+                                        'x': 0, 'xanchor': 'left', 'y': 1.1, 'yanchor': 'bottom'}])
+    return fig
+
+
+# _____________________________________________________________________________
+def build_figure(df: pd.DataFrame, tag: str, config_views: list[ConfigPlotView],
+                 layout: str = 'subplots', ds: Optional[ConfigDownsample] = None,
+                 webgl_points: int = WEBGL_POINTS) -> go.Figure | list[go.Figure]:
+    """Figure of plot, or for the lazy layout a figure per view"""
+    _logger.debug(f'build_figure: {layout}')
+
+    if layout == 'shared':
+        return _shared_figure(df, tag, config_views, ds, webgl_points)
+    elif layout == 'lazy':
+        return _view_figures(df, tag, config_views, webgl_points)
+    return _subplots_figure(df, tag, config_views, webgl_points)
+
+
+# _____________________________________________________________________________
+def write_chart(fig: go.Figure | list[go.Figure], output_filepath: Path, title: str = ''):
+    import plotly as py
 
-    # Save to file
     _logger.debug(f'Write chart: "{output_filepath}"')
-    py.io.write_html(fig, str(output_filepath),
-                     include_plotlyjs='directory', full_html=True, config={'displaylogo': False})
+    with span('html_write') as sp:
+        if isinstance(fig, list):
+            from lazyChart import write_lazy_chart
+            sp.set(bytes=write_lazy_chart(fig, Path(output_filepath), title))
+            return
+        with replace_file(output_filepath) as tmp_filepath:
+            py.io.write_html(fig, str(tmp_filepath),
+                             include_plotlyjs='directory', full_html=True, config={'displaylogo': False})
+        sp.set(bytes=Path(output_filepath).stat().st_size)
 
 
 # _____________________________________________________________________________
-def process(app_config: AppConfig):
-    _logger.debug('process')
+def plot_chart(df: pd.DataFrame, tag: str, config_views: list[ConfigPlotView], output_filepath: Path,
+               layout: str = 'subplots', ds: Optional[ConfigDownsample] = None,
+               webgl_points: int = WEBGL_POINTS):
+    write_chart(build_figure(df, tag, config_views, layout, ds, webgl_points), output_filepath, tag)
+
 
-    for i, plot_config in enumerate(app_config.plot_configs):
-        output_filepath = Path(app_config.plot_path, plot_config.filename)
-        data_frame_filepath = Path(app_config.data_frame_path, plot_config.filename).with_suffix('.csv')
+# _____________________________________________________________________________
+def plot_output_paths(plot_config: ConfigPlot, app_config: AppConfig) -> list[Path]:
+    """Chart, snapshot, then any view sidecars of the chart"""
+    from lazyChart import sidecar_filepaths
 
-        df = load_plot_data(plot_config, app_config)
-        df.to_csv(data_frame_filepath)
-        plot_chart(df, plot_config.tag, plot_config.views, output_filepath)
+    output_filepath = Path(app_config.plot_path, plot_config.filename)
+    data_frame_filepath = snapshot_filepath(Path(app_config.data_frame_path, plot_config.filename),
+                                            app_config.snapshot_format)
+    sidecars = sidecar_filepaths(output_filepath, len(plot_config.views)) if plot_config.layout == 'lazy' else []
+    return [output_filepath, data_frame_filepath, *sidecars]
+
+
+# _____________________________________________________________________________
+def process_plot(plot_config: ConfigPlot, app_config: AppConfig, frame_cache: FrameCache):
+    output_filepath, data_frame_filepath, *_ = plot_output_paths(plot_config, app_config)
+
+    df = load_plot_data(plot_config, app_config, frame_cache)
+    write_snapshot(df, data_frame_filepath, app_config.snapshot_format, app_config.snapshot_compression)
+    plot_chart(df, plot_config.tag, plot_config.views, output_filepath, plot_config.layout, plot_config.downsample,
+               plot_config.webgl_points)
+
+
+# _____________________________________________________________________________
+def _try_process_plot(plot_config: ConfigPlot, app_config: AppConfig, frame_cache: FrameCache,
+                      trace_memory: bool = False, profile_tag: Optional[str] = None) -> tuple[Optional[str], dict]:
+    """Process plot returning error text rather than raising, so one bad plot does not stop the rest
+
+    Also returns the plot's instrumentation record.  Plots tagged profile_tag
+    are profiled, with stats written beside the plot.
+    """
+    with plot_record(plot_config.idx, plot_config.tag, plot_config.filename, trace_memory) as record:
+        profiler = cProfile.Profile() if profile_tag is not None and plot_config.tag == profile_tag else None
+        try:
+            if profiler:
+                profiler.runcall(process_plot, plot_config, app_config, frame_cache)
+            else:
+                process_plot(plot_config, app_config, frame_cache)
+            error = None
+        except Exception as ex:
+            _logger.exception(f'{plot_config.tag}:{plot_config.idx} - failed "{plot_config.filename}"')
+            error = ''.join(traceback.format_exception_only(type(ex), ex)).strip()
+        if profiler:
+            profile_filepath = Path(app_config.plot_path, plot_config.filename).with_suffix('.prof')
+            with replace_file(profile_filepath) as tmp_filepath:
+                profiler.dump_stats(tmp_filepath)
+            _logger.info(f'{plot_config.tag}:{plot_config.idx} - profile "{profile_filepath}"')
+    record['status'] = 'failed' if error else 'built'
+    return error, record
+
+
+# _____________________________________________________________________________
+def _init_worker(log_queue: multiprocessing.Queue, frame_cache_path: Path):
+    global _worker_frame_cache
+
+    init_worker_logging(log_queue)
+    # Main process handles interrupts, shutting workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_frame_cache = FrameCache(frame_cache_path)
+
+
+# _____________________________________________________________________________
+def _worker_process_plot(plot_config: ConfigPlot, app_config: AppConfig, digests: dict[Path, tuple[int, int, str]],
+                         trace_memory: bool, profile_tag: Optional[str]) -> tuple[Optional[str], dict]:
+    # Input files hashed by the main process are not read again to hash them
+    _worker_frame_cache.add_digests(digests)
+    return _try_process_plot(plot_config, app_config, _worker_frame_cache, trace_memory, profile_tag)
+
+
+# _____________________________________________________________________________
+class WorkerPool:
+    """Worker processes processing plots, forwarding their log records to the main process
+
+    Workers keep parsed frames in memory for as long as the pool is open, so
+    a pool kept between runs (eg while watching) keeps frames hot.
+    """
+
+    # _____________________________________________________________________________
+    def __init__(self, jobs: int, log_handlers: list[logging.Handler], frame_cache_path: Path):
+        log_queue = multiprocessing.Queue()
+        self._listener = logging.handlers.QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+        self._listener.start()
+        self._executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                             initargs=(log_queue, frame_cache_path))
+
+    # _____________________________________________________________________________
+    def submit(self, fn, /, *args) -> Future:
+        return self._executor.submit(fn, *args)
+
+    # _____________________________________________________________________________
+    def close(self):
+        try:
+            self._executor.shutdown()
+        finally:
+            self._listener.stop()
+
+    # _____________________________________________________________________________
+    def __enter__(self) -> WorkerPool:
+        return self
+
+    # _____________________________________________________________________________
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# _____________________________________________________________________________
+def process(app_config: AppConfig, jobs: int = 1, log_handlers: list[logging.Handler] = (),
+            force: bool = False, trace_memory: bool = False, profile_tag: Optional[str] = None,
+            dashboard: bool = False, candidates: Optional[list[ConfigPlot]] = None,
+            frame_cache: Optional[FrameCache] = None, pool: Optional[WorkerPool] = None) -> dict[int, str]:
+    """Process plots whose configuration or inputs changed since last build, returning errors by plot index
+
+    Only candidates are considered if given, otherwise all plots.  A frame cache
+    kept between calls keeps parsed frames in memory, as does a pool of workers
+    for jobs, otherwise a pool is opened for the call.  A run report of stage
+    timings and memory of each plot is written beside the plots.  With dashboard
+    a page of all plots is also written.
+    """
+    _logger.debug(f'process: {jobs} jobs')
+    with run_record() as run_spans:
+        start_time = time.perf_counter()
+        candidates = app_config.plot_configs if candidates is None else candidates
+
+        # Shared across plots so each input file is parsed at most once per run
+        if frame_cache is None:
+            frame_cache = FrameCache(app_config.frame_cache_path)
+
+        if app_config.data_source == 'store':
+            sync_price_store(candidates, app_config)
+
+        # Skip plots unchanged since last build
+        manifest = BuildManifest(app_config.manifest_path)
+        fingerprints, plot_configs, records = {}, [], []
+        with span('fingerprint', plots=len(candidates)):
+            # Read inputs not hashed before in parallel, as reads dominate on network storage
+            frame_cache.digest_all((x for pc in candidates for x in plot_input_paths(pc, app_config)),
+                                   app_config.read_threads, app_config.read_buffer_bytes)
+            for plot_config in candidates:
+                fingerprint = BuildManifest.fingerprint(plot_config, plot_input_paths(plot_config, app_config),
+                                                        frame_cache, snapshot_format=app_config.snapshot_format,
+                                                        snapshot_compression=app_config.snapshot_compression,
+                                                        frame_dtype=app_config.frame_dtype,
+                                                        data_source=app_config.data_source)
+                fingerprints[plot_config.idx] = fingerprint
+                if not force and manifest.reuse(plot_config, fingerprint, plot_output_paths(plot_config, app_config)):
+                    _logger.debug(f'{plot_config.tag}:{plot_config.idx} - up to date "{plot_config.filename}"')
+                    records.append({'idx': plot_config.idx, 'tag': plot_config.tag, 'filename': plot_config.filename,
+                                    'status': 'upToDate'})
+                else:
+                    plot_configs.append(plot_config)
+
+        errors = {}
+        if jobs <= 1 or len(plot_configs) <= 1:
+            for plot_config in plot_configs:
+                error, record = _try_process_plot(plot_config, app_config, frame_cache, trace_memory, profile_tag)
+                records.append(record)
+                if error:
+                    errors[plot_config.idx] = error
+        else:
+            workers = pool or WorkerPool(jobs, log_handlers, app_config.frame_cache_path)
+            with nullcontext(workers) if pool else workers:
+                # Tasks carry only their plot, paths and options, and hashes of their inputs
+                task_config = app_config.without_plots()
+                futures = [workers.submit(_worker_process_plot, pc, task_config,
+                                          frame_cache.known_digests(plot_input_paths(pc, app_config)),
+                                          trace_memory, profile_tag)
+                           for pc in plot_configs]
+                # Collect in configuration order so reporting is deterministic
+                for plot_config, future in zip(plot_configs, futures):
+                    try:
+                        error, record = future.result()
+                    except Exception as ex:
+                        error = f'worker failed: {ex!r}'
+                        record = {'idx': plot_config.idx, 'tag': plot_config.tag, 'filename': plot_config.filename,
+                                  'status': 'failed'}
+                    records.append(record)
+                    if error:
+                        errors[plot_config.idx] = error
+
+        # Record successful builds
+        for plot_config in plot_configs:
+            if error := errors.get(plot_config.idx):
+                manifest.discard(plot_config)
+                _logger.error(f'{plot_config.tag}:{plot_config.idx} - "{plot_config.filename}": {error}')
+            else:
+                manifest.update(plot_config, fingerprints[plot_config.idx], plot_output_paths(plot_config, app_config))
+        manifest.save()
+
+        skipped = len(candidates) - len(plot_configs)
+        _logger.info(f'Plots: {len(plot_configs) - len(errors)} built, {skipped} up to date, {len(errors)} failed')
+        if dashboard:
+            from dashboard import write_dashboard
+            write_dashboard(app_config.plot_configs, app_config, frame_cache)
+
+        # Share files identical to those of earlier days
+        with span('blob_ingest') as sp:
+            linked, shared = BlobStore(app_config.blob_store_path).ingest_folders([app_config.plot_path,
+                                                                                   app_config.data_frame_path])
+            sp.set(files=linked, sharedBytes=shared)
+        _logger.debug(f'Blob store: {linked} files linked, {shared:,} bytes shared')
+        write_report(Path(app_config.plot_path, REPORT_FILENAME), run_spans, records, jobs=jobs,
+                     traceMemory=trace_memory, built=len(plot_configs) - len(errors), upToDate=skipped,
+                     failed=len(errors),
+                     seconds=round(time.perf_counter() - start_time, 6))
+        return errors
+
+
+# _____________________________________________________________________________
+def parse_args(args=None) -> argparse.Namespace:
+    arg_parser = argparse.ArgumentParser(description='Plot share prices')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help='number of plots processed in parallel (default: 1)')
+    arg_parser.add_argument('-f', '--force', action='store_true',
+                            help='rebuild all plots, even those unchanged since last build')
+    arg_parser.add_argument('--check', action='store_true',
+                            help='parse and validate plots configuration, then exit without building plots')
+    arg_parser.add_argument('--snapshot-format', choices=list(SNAPSHOT_FORMATS), default='feather',
+                            help='format of data frame snapshots (default: feather)')
+    arg_parser.add_argument('--snapshot-compression', default=None,
+                            help='snapshot compression codec (default: lz4 for feather, zstd for parquet)')
+    arg_parser.add_argument('--frame-dtype', choices=FRAME_DTYPES, default='float64',
+                            help='data type of prices held in memory; float32 uses half the memory of float64, '
+                                 'int32 (fixed point, with a missing value mask) 5/8 (default: float64)')
+    arg_parser.add_argument('--data-source', choices=DATA_SOURCES, default='csv',
+                            help='read prices from csv files, or from the memory mapped price store after '
+                                 'importing changed csv files into it (default: csv)')
+    arg_parser.add_argument('--watch', action='store_true',
+                            help='keep running, rebuilding plots as their input files or the configuration change')
+    arg_parser.add_argument('--watch-interval', type=float, default=1.0, metavar='SECONDS',
+                            help='seconds between checks for changes when watching (default: 1)')
+    arg_parser.add_argument('--debounce', type=float, default=2.0, metavar='SECONDS',
+                            help='seconds without further changes before rebuilding when watching (default: 2)')
+    arg_parser.add_argument('--read-threads', type=int, default=4,
+                            help='csv files read ahead of parsing in parallel; 0 reads each as parsed (default: 4)')
+    arg_parser.add_argument('--read-buffer', type=int, default=64, metavar='MB',
+                            help='limit of csv file content read ahead but not yet parsed (default: 64)')
+    arg_parser.add_argument('--trace-memory', action='store_true',
+                            help='trace peak memory allocated for each plot in the run report (slower)')
+    arg_parser.add_argument('--profile', metavar='TAG', default=None,
+                            help='profile plots with tag, writing cProfile stats beside each plot')
+    arg_parser.add_argument('--dashboard', action='store_true',
+                            help='also write a dashboard page of all plots, storing each distinct series once')
+    return arg_parser.parse_args(args)
 
 
 # _____________________________________________________________________________
 def main():
+    args = parse_args()
+    log_handlers = configure_logging(Path(__file__).with_suffix('.log'))
     start_time = time.time()
     app_path = Path(__file__)
     try:
@@ -73,7 +460,40 @@ def main():
         _logger.info(f'Now: {start_datetime.strftime("%a  %d-%b-%y  %I:%M:%S %p")}')
 
         # Run application
-        process(AppConfig(app_path, app_path.parents[1]))
+        def make_app_config() -> AppConfig:
+            return AppConfig(app_path, app_path.parents[1], args.snapshot_format, args.snapshot_compression,
+                             args.frame_dtype, args.data_source, args.read_threads, args.read_buffer << 20)
+
+        if args.watch:
+            from watcher import Watcher
+
+            # Kept while watching so workers keep their parsed frames between rebuilds
+            pool = None
+
+            def build(app_config: AppConfig, candidates: list[ConfigPlot], frame_cache: FrameCache):
+                nonlocal pool
+                if pool is None and args.jobs > 1:
+                    pool = WorkerPool(args.jobs, log_handlers, app_config.frame_cache_path)
+                process(app_config, args.jobs, log_handlers, args.force, args.trace_memory, args.profile,
+                        args.dashboard, candidates, frame_cache, pool)
+
+            try:
+                Watcher(make_app_config, build, args.watch_interval, args.debounce).run()
+            finally:
+                if pool:
+                    pool.close()
+            return
+
+        # Parsing configuration is part of the run report
+        with run_record():
+            app_config = make_app_config()
+            if args.check:
+                _logger.info(f'Config valid: {len(app_config.plot_configs)} plots')
+                return
+            process(app_config, args.jobs, log_handlers, args.force, args.trace_memory, args.profile,
+                    args.dashboard)
+    except KeyboardInterrupt:
+        _logger.info('Interrupted')
     except Exception as ex:
         _logger.exception('Catch all exception')
     finally:
@@ -0,0 +1,78 @@
+"""Read files ahead of their use on a bounded pool of threads
+
+Reads of the next files overlap parsing of files already read, which hides
+the latency of slow (eg network mounted) storage.  Reads in flight and file
+bytes read but not yet used are both bounded.
+"""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging.handlers
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_READS = 4
+DEFAULT_MAX_BYTES = 64 << 20
+
+
+# _____________________________________________________________________________
+def _file_size(filepath: Path) -> int:
+    try:
+        return filepath.stat().st_size
+    except OSError:
+        # Read fails too, yielding no content
+        return 0
+
+
+# _____________________________________________________________________________
+def _read(filepath: Path) -> Optional[bytes]:
+    try:
+        return filepath.read_bytes()
+    except OSError as ex:
+        _logger.debug(f'Prefetch failed "{filepath}": {ex}')
+        return None
+
+
+# _____________________________________________________________________________
+def prefetch(filepaths: Iterable[Path], max_reads: int = DEFAULT_READS,
+             max_bytes: int = DEFAULT_MAX_BYTES) -> Iterator[tuple[Path, Optional[bytes]]]:
+    """Yield (filepath, content) of files in order, reading up to max_reads files ahead
+
+    Files are read ahead only while content read but not yet yielded stays
+    within max_bytes.  Files larger than max_bytes are not read, nor files
+    that cannot be read; their content is None so the caller reads the file
+    its own way (eg in chunks), or raises as usual.  With max_reads 0 files
+    are read as they are reached.
+    """
+    queued = deque(Path(x) for x in filepaths)
+    # A single file has nothing to overlap with
+    if max_reads <= 0 or len(queued) <= 1:
+        for filepath in queued:
+            yield filepath, _read(filepath) if _file_size(filepath) <= max_bytes else None
+        return
+
+    pending: deque[tuple[Path, int, Optional[Future]]] = deque()
+    pending_bytes = 0
+    with ThreadPoolExecutor(max_reads, thread_name_prefix='prefetch') as pool:
+        try:
+            while queued or pending:
+                while queued and len(pending) < max_reads:
+                    size = _file_size(queued[0])
+                    if pending and pending_bytes + size > max_bytes:
+                        break
+                    filepath = queued.popleft()
+                    if size > max_bytes:
+                        pending.append((filepath, 0, None))
+                        continue
+                    pending.append((filepath, size, pool.submit(_read, filepath)))
+                    pending_bytes += size
+
+                filepath, size, future = pending.popleft()
+                pending_bytes -= size
+                yield filepath, future.result() if future else None
+        finally:
+            # Consumer stopped early: drop reads not started
+            for _, _, future in pending:
+                if future:
+                    future.cancel()
@@ -0,0 +1,174 @@
+"""Consolidated store of price columns as memory mapped NumPy arrays
+
+Each imported csv file is held as one contiguous, ascending date array and
+one value array per numeric column, saved as .npy files so they can be
+memory mapped.  A json catalog maps source file names to their arrays and
+records the size and modification time of the source, so only changed
+files are imported again.
+
+Usage: python priceStore.py [--data folder] [--store folder]
+"""
+import argparse
+import hashlib
+import json
+import logging.handlers
+from os import PathLike
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from appUtils import replace_file
+
+_logger = logging.getLogger(__name__)
+_CATALOG_FILENAME = 'catalog.json'
+_CATALOG_VERSION = 1
+_DATE_COLUMN = 'Date'
+
+
+# _____________________________________________________________________________
+class PriceStore:
+    """Price arrays of imported csv files, by source file name and column"""
+
+    # _____________________________________________________________________________
+    def __init__(self, store_path: PathLike):
+        self._store_path = Path(store_path).resolve()
+        self._catalog_filepath = Path(self._store_path, _CATALOG_FILENAME)
+        self._entries: dict[str, dict] = {}
+        self._catalog_mtime_ns = None
+        self._load_catalog()
+
+    # _____________________________________________________________________________
+    def _load_catalog(self):
+        try:
+            self._catalog_mtime_ns = self._catalog_filepath.stat().st_mtime_ns
+            data = json.loads(self._catalog_filepath.read_text())
+            self._entries = data.get('entries', {}) if data.get('version') == _CATALOG_VERSION else {}
+        except (OSError, ValueError):
+            self._entries = {}
+
+    # _____________________________________________________________________________
+    def refresh(self):
+        """Reload catalog if another process has updated it"""
+        try:
+            if self._catalog_filepath.stat().st_mtime_ns != self._catalog_mtime_ns:
+                self._load_catalog()
+        except OSError:
+            self._entries = {}
+
+    # _____________________________________________________________________________
+    def save(self):
+        self._store_path.mkdir(parents=True, exist_ok=True)
+        with replace_file(self._catalog_filepath) as tmp_filepath:
+            tmp_filepath.write_text(json.dumps({'version': _CATALOG_VERSION, 'entries': self._entries}, indent=1))
+        self._catalog_mtime_ns = self._catalog_filepath.stat().st_mtime_ns
+
+    # _____________________________________________________________________________
+    def is_current(self, filepath: PathLike) -> bool:
+        """Whether source file is imported and unchanged since"""
+        filepath = Path(filepath)
+        if (entry := self._entries.get(filepath.name)) is None:
+            return False
+        stat = filepath.stat()
+        return entry['size'] == stat.st_size and entry['mtimeNs'] == stat.st_mtime_ns
+
+    # _____________________________________________________________________________
+    def import_csv(self, filepath: PathLike, date_format: Optional[str] = None) -> dict:
+        """Import numeric columns of csv file, replacing any earlier import of it; catalog is not saved"""
+        import pandas as pd
+        from dateParsing import parse_date_column
+
+        filepath = Path(filepath).resolve()
+        stat = filepath.stat()
+        df = pd.read_csv(filepath, dtype={_DATE_COLUMN: str})
+        date_col = _DATE_COLUMN if _DATE_COLUMN in df.columns else df.columns[0]
+        dates = parse_date_column(df[date_col].to_numpy(), date_format, dayfirst=True)
+        df = df.drop(columns=[date_col]).select_dtypes('number').astype(np.float64)
+
+        # Ascending dates so a plot's series are aligned without sorting
+        order = np.argsort(dates.to_numpy(), kind='stable')
+        stem = hashlib.sha256(filepath.name.encode()).hexdigest()[:24]
+        array_path = Path(self._store_path, 'arrays')
+        array_path.mkdir(parents=True, exist_ok=True)
+        self._save_array(Path(array_path, f'{stem}.dates.npy'), dates.to_numpy()[order].astype('datetime64[ns]'))
+        for i, col in enumerate(df.columns):
+            self._save_array(Path(array_path, f'{stem}.{i}.npy'), df[col].to_numpy()[order])
+
+        entry = {'size': stat.st_size, 'mtimeNs': stat.st_mtime_ns, 'stem': stem, 'rows': len(df),
+                 'columns': list(df.columns), 'dateFormat': date_format}
+        self._entries[filepath.name] = entry
+        _logger.debug(f'Imported "{filepath.name}": {len(df):,} rows, {len(df.columns)} columns')
+        return entry
+
+    # _____________________________________________________________________________
+    @staticmethod
+    def _save_array(filepath: Path, values: np.ndarray):
+        # Write then rename so readers mapping the old array are unaffected
+        with replace_file(filepath) as tmp_filepath, tmp_filepath.open(mode='wb') as fp:
+            np.save(fp, np.ascontiguousarray(values))
+
+    # _____________________________________________________________________________
+    def sync(self, sources: Iterable[tuple[PathLike, Optional[str]]]) -> int:
+        """Import (filepath, date format) sources that changed since imported, returning number imported
+
+        Files are imported again if given a date format other than the one they were imported with.
+        """
+        count = 0
+        for filepath, date_format in sources:
+            entry = self._entries.get(Path(filepath).name)
+            if not self.is_current(filepath) or (date_format and entry.get('dateFormat') != date_format):
+                self.import_csv(filepath, date_format)
+                count += 1
+        if count:
+            self.save()
+        return count
+
+    # _____________________________________________________________________________
+    def load(self, filename: str, column: str) -> tuple[np.ndarray, np.ndarray]:
+        """Memory mapped (dates, values) arrays of column of imported file"""
+        if (entry := self._entries.get(filename)) is None:
+            raise KeyError(f'Not in price store: "{filename}"')
+        try:
+            i = entry['columns'].index(column)
+        except ValueError:
+            raise KeyError(f'Column "{column}" not in price store: "{filename}"') from None
+
+        array_path = Path(self._store_path, 'arrays')
+        dates = np.load(Path(array_path, f'{entry["stem"]}.dates.npy'), mmap_mode='r')
+        values = np.load(Path(array_path, f'{entry["stem"]}.{i}.npy'), mmap_mode='r')
+        return dates, values
+
+    # _____________________________________________________________________________
+    @property
+    def store_path(self):
+        return self._store_path
+
+    # _____________________________________________________________________________
+    @property
+    def filenames(self) -> list[str]:
+        return sorted(self._entries)
+
+
+# _____________________________________________________________________________
+def parse_args(args=None) -> argparse.Namespace:
+    base_path = Path(__file__).parents[1]
+    arg_parser = argparse.ArgumentParser(description='Import csv price files into the price store')
+    arg_parser.add_argument('--data', type=Path, default=Path(base_path, 'data'),
+                            help='folder of csv files')
+    arg_parser.add_argument('--store', type=Path, default=Path(base_path, 'output', 'store'),
+                            help='price store folder')
+    return arg_parser.parse_args(args)
+
+
+# _____________________________________________________________________________
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    store = PriceStore(args.store)
+    count = store.sync((x, None) for x in sorted(args.data.glob('*.csv')))
+    _logger.info(f'Imported {count} files, {len(store.filenames)} in store "{store.store_path}"')
+
+
+# _____________________________________________________________________________
+if __name__ == '__main__':
+    main()
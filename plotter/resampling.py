@@ -0,0 +1,86 @@
+"""Resample csv price files to bars while reading them in chunks
+
+Intraday and tick files can be too large to load whole, so they are read a
+chunk of rows at a time and each chunk reduced to bars of the configured
+interval.  Partial bars of consecutive chunks are then combined, so memory
+is bounded by the chunk size and the number of bars, however large the file.
+Rows are expected in ascending time order, as tick files are written.
+
+Bars hold either the last price in each interval, or open, high, low and
+last prices.
+"""
+from __future__ import annotations
+from io import BytesIO
+import logging.handlers
+from pathlib import Path
+from typing import TYPE_CHECKING, Union
+
+from configParser import ConfigResample
+from dateParsing import infer_format, parse_date_column
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_logger = logging.getLogger(__name__)
+
+# Bar intervals of the configuration, as pandas frequencies
+INTERVALS = {'1m': '1min', '5m': '5min', '15m': '15min', '30m': '30min', '1h': '1h', '1d': '1D'}
+_OHLC = (('Open', 'first'), ('High', 'max'), ('Low', 'min'))
+_CHUNK_ROWS = 1 << 16
+
+
+# _____________________________________________________________________________
+def bar_columns(key: str, column: str, resample: ConfigResample) -> list[tuple[str, str]]:
+    """(Field key, resampled column) of each bar value of a requested field, the last price last"""
+    if resample.bars != 'ohlc':
+        return [(key, column)]
+    # Exit (the price) is named by code alone, so its bar values are named by part alone
+    return [(name if key == 'Exit' else f'{key} {name}', f'{column} {name}') for name, _ in _OHLC] + [(key, column)]
+
+
+# _____________________________________________________________________________
+def _aggregations(value_cols: list[str], resample: ConfigResample) -> dict[str, tuple[str, str]]:
+    """Resampled column: (source column, aggregation)"""
+    aggs = {}
+    for col in value_cols:
+        if resample.bars == 'ohlc':
+            aggs.update({f'{col} {name}': (col, how) for name, how in _OHLC})
+        aggs[col] = (col, 'last')
+    return aggs
+
+
+# _____________________________________________________________________________
+def read_resampled_csv(source: Union[Path, bytes], date_col: str, value_cols: list[str], date_format: str,
+                       resample: ConfigResample, chunk_rows: int = _CHUNK_ROWS) -> pd.DataFrame:
+    """Frame of bars of value columns of csv file or content, indexed by bar start time"""
+    import numpy as np
+    import pandas as pd
+
+    freq = INTERVALS[resample.interval]
+    aggs = _aggregations(value_cols, resample)
+    dtype = {date_col: str, **dict.fromkeys(value_cols, 'float64')}
+    reader = pd.read_csv(BytesIO(source) if isinstance(source, bytes) else str(source),
+                         usecols=[date_col, *value_cols], dtype=dtype, chunksize=chunk_rows)
+
+    partials, rows = [], 0
+    with reader:
+        for chunk in reader:
+            values = chunk[date_col].to_numpy()
+            # Format inferred once so every chunk is parsed alike
+            if date_format is None:
+                date_format = infer_format((x for x in values[:20] if isinstance(x, str)), dayfirst=True)
+            bars = parse_date_column(values, date_format, dayfirst=True).floor(freq)
+            grouped = chunk.groupby(bars.to_numpy(), sort=False)
+            partials.append(pd.DataFrame({name: grouped[col].agg(how) for name, (col, how) in aggs.items()}))
+            rows += len(chunk)
+
+    if not partials:
+        return pd.DataFrame(columns=list(aggs), index=pd.DatetimeIndex([], name=date_col), dtype=np.float64)
+
+    # A bar may span chunks; combine its partial bars
+    combined = pd.concat(partials)
+    grouped = combined.groupby(level=0, sort=True)
+    df = pd.DataFrame({name: grouped[name].agg(how) for name, (_, how) in aggs.items()})
+    df.index = pd.DatetimeIndex(df.index, name=date_col)
+    _logger.debug(f'Resampled {rows:,} rows to {len(df):,} {resample.interval} bars')
+    return df
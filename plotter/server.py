@@ -0,0 +1,309 @@
+"""Local http server rendering plots when requested
+
+Plots are rendered on first request rather than built in advance, and
+responses are cached by the plot's fingerprint (see BuildManifest) and
+request parameters, so a plot is rendered again only when its configuration
+or input files change.  Parsed frames are cached too, so requests of other
+views of a plot only slice the frame.  Responses carry an ETag so browsers
+revalidate cheaply, and are gzipped where the client accepts it.  No run
+is recorded (see instrumentation.run_record), so stage spans of rendering
+are not kept by the long running server.
+
+Usage: python server.py [--host 127.0.0.1] [--port 8050]
+
+    /                           index of plots
+    /plots/<filename>           plot page
+        ?start=yyyy-mm-dd       single view from start date instead of the plot's views
+        ?codes=A,B              only series of these codes
+        ?format=json            figure json rather than html
+    /plots/plotly.min.js        plotly.js, shared by plot pages
+"""
+from __future__ import annotations
+import argparse
+from collections import OrderedDict
+from dataclasses import dataclass
+import gzip
+import hashlib
+from html import escape
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging.handlers
+from pathlib import Path
+import threading
+from typing import Callable, Optional, TYPE_CHECKING
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from appConfig import AppConfig
+from buildManifest import BuildManifest
+from configParser import ConfigPlot, ConfigPlotView
+from dataLoader import DATA_SOURCES, FRAME_DTYPES, load_plot_data, plot_input_paths, sync_price_store
+from frameCache import FrameCache
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_logger = logging.getLogger(__name__)
+
+_MAX_RESPONSES = 64
+_MAX_FRAMES = 16
+# Smaller responses are not worth compressing
+_GZIP_MIN_BYTES = 1024
+
+
+# _____________________________________________________________________________
+class RequestError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# _____________________________________________________________________________
+@dataclass
+class Response:
+    __slots__ = ['body', 'content_type', 'etag', '_gzipped']
+
+    body: bytes
+    content_type: str
+    etag: str
+
+    # _____________________________________________________________________________
+    def __init__(self, body: bytes, content_type: str, etag: Optional[str] = None):
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag or f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self._gzipped = None
+
+    # _____________________________________________________________________________
+    @property
+    def gzip_etag(self) -> str:
+        """ETag of the gzipped body, which must differ from that of the body as a strong validator"""
+        return f'{self.etag[:-1]}-gzip"'
+
+    # _____________________________________________________________________________
+    @property
+    def gzipped(self) -> bytes:
+        """Body gzipped, compressed once per response"""
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6)
+        return self._gzipped
+
+
+# _____________________________________________________________________________
+def _lru_put(cache: OrderedDict, key, value, max_items: int):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_items:
+        cache.popitem(last=False)
+
+
+# _____________________________________________________________________________
+class PlotRenderer:
+    """Renders plots of the configuration, caching frames and responses by plot fingerprint"""
+
+    # _____________________________________________________________________________
+    def __init__(self, make_app_config: Callable[[], AppConfig]):
+        self._make_app_config = make_app_config
+        self._app_config = make_app_config()
+        self._config_stat = self._stat_config()
+        self._frame_cache = FrameCache(self._app_config.frame_cache_path)
+        self._frames: OrderedDict[str, pd.DataFrame] = OrderedDict()
+        self._responses: OrderedDict[str, Response] = OrderedDict()
+        self._plotlyjs: Optional[Response] = None
+        # Pandas and plotly are not thread safe; requests render one at a time
+        self._lock = threading.Lock()
+
+    # _____________________________________________________________________________
+    def _stat_config(self) -> tuple[int, int]:
+        stat = self._app_config.config_filepath.stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    # _____________________________________________________________________________
+    def _refresh_config(self):
+        """Reload configuration if changed since loaded"""
+        if self._stat_config() != self._config_stat:
+            _logger.info('Configuration changed: reloading')
+            self._app_config = self._make_app_config()
+            self._config_stat = self._stat_config()
+
+    # _____________________________________________________________________________
+    def _plot_config(self, filename: str) -> ConfigPlot:
+        for plot_config in self._app_config.plot_configs:
+            if plot_config.filename == filename:
+                return plot_config
+        raise RequestError(HTTPStatus.NOT_FOUND, f'No plot "{filename}"')
+
+    # _____________________________________________________________________________
+    def _frame(self, plot_config: ConfigPlot) -> tuple[str, pd.DataFrame]:
+        """Fingerprint and frame of plot, parsing inputs only if changed"""
+        app_config = self._app_config
+        if app_config.data_source == 'store':
+            sync_price_store([plot_config], app_config)
+        fingerprint = BuildManifest.fingerprint(plot_config, plot_input_paths(plot_config, app_config),
+                                                self._frame_cache, frame_dtype=app_config.frame_dtype,
+                                                data_source=app_config.data_source)
+        if fingerprint is None:
+            raise RequestError(HTTPStatus.NOT_FOUND, f'Input files of "{plot_config.filename}" missing')
+        if (df := self._frames.get(fingerprint)) is None:
+            df = load_plot_data(plot_config, app_config, self._frame_cache)
+            _lru_put(self._frames, fingerprint, df, _MAX_FRAMES)
+        else:
+            self._frames.move_to_end(fingerprint)
+        return fingerprint, df
+
+    # _____________________________________________________________________________
+    def plot(self, filename: str, start: Optional[str] = None, codes: Optional[list[str]] = None,
+             fmt: str = 'html') -> Response:
+        """Rendered plot, from cache if its configuration and inputs are unchanged"""
+        from plotter import build_figure
+
+        if fmt not in ('html', 'json'):
+            raise RequestError(HTTPStatus.BAD_REQUEST, f'Unknown format "{fmt}"')
+        with self._lock:
+            self._refresh_config()
+            plot_config = self._plot_config(filename)
+            fingerprint, df = self._frame(plot_config)
+
+            key = hashlib.sha256(repr((fingerprint, start, codes, fmt)).encode()).hexdigest()[:32]
+            if (response := self._responses.get(key)) is not None:
+                self._responses.move_to_end(key)
+                return response
+
+            views = plot_config.views
+            if start:
+                try:
+                    views = [ConfigPlotView({'startDate': start}, 0, plot_config.downsample)]
+                except (ValueError, OverflowError):
+                    raise RequestError(HTTPStatus.BAD_REQUEST, f'Invalid start date "{start}"') from None
+            if codes:
+                df = df[[x for x in df.columns if x.split('|')[0] in codes]]
+                if df.columns.empty:
+                    raise RequestError(HTTPStatus.BAD_REQUEST, f'No series of codes: {", ".join(codes)}')
+
+            # Lazy layout loads views from files beside the page, so is served as subplots
+            layout = 'subplots' if plot_config.layout == 'lazy' else plot_config.layout
+            fig = build_figure(df, plot_config.tag, views, layout, plot_config.downsample, plot_config.webgl_points)
+            if fmt == 'json':
+                response = Response(fig.to_json().encode(), 'application/json', f'"{key}"')
+            else:
+                html = fig.to_html(include_plotlyjs='directory', full_html=True, config={'displaylogo': False})
+                response = Response(html.encode(), 'text/html; charset=utf-8', f'"{key}"')
+            _lru_put(self._responses, key, response, _MAX_RESPONSES)
+            _logger.info(f'{plot_config.tag}:{plot_config.idx} - rendered "{filename}" {fmt}: '
+                         f'{len(response.body):,} bytes')
+            return response
+
+    # _____________________________________________________________________________
+    def plotlyjs(self) -> Response:
+        if self._plotlyjs is None:
+            from plotly.offline import get_plotlyjs
+            self._plotlyjs = Response(get_plotlyjs().encode(), 'text/javascript; charset=utf-8')
+        return self._plotlyjs
+
+    # _____________________________________________________________________________
+    def index(self) -> Response:
+        with self._lock:
+            self._refresh_config()
+            items = [f'<li><a href="/plots/{quote(x.filename)}">{escape(x.tag or x.filename)}</a></li>'
+                     for x in self._app_config.plot_configs]
+        html = f'<html><head><meta charset="utf-8" /><title>Plots</title></head>' \
+               f'<body><ul>{"".join(items)}</ul></body></html>'
+        return Response(html.encode(), 'text/html; charset=utf-8')
+
+
+# _____________________________________________________________________________
+class _Handler(BaseHTTPRequestHandler):
+    renderer: PlotRenderer = None
+
+    # _____________________________________________________________________________
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        try:
+            if url.path == '/':
+                response = self.renderer.index()
+            elif url.path == '/plots/plotly.min.js':
+                response = self.renderer.plotlyjs()
+            elif url.path.startswith('/plots/'):
+                filename = unquote(url.path.removeprefix('/plots/'))
+                codes = [x for v in params.get('codes', []) for x in v.split(',') if x]
+                response = self.renderer.plot(filename, params.get('start', [None])[-1], codes or None,
+                                              params.get('format', ['html'])[-1])
+            else:
+                raise RequestError(HTTPStatus.NOT_FOUND, f'Not found "{url.path}"')
+        except RequestError as ex:
+            self.send_error(ex.status, str(ex))
+            return
+        except Exception:
+            _logger.exception(f'Request failed "{self.path}"')
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
+            return
+        self._send(response)
+
+    # _____________________________________________________________________________
+    def _send(self, response: Response):
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '') and len(response.body) >= _GZIP_MIN_BYTES
+        etag = response.gzip_etag if gzipped else response.etag
+
+        # Revalidated on each use, as plots change whenever their inputs do
+        if etag in [x.strip() for x in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return
+
+        body = response.gzipped if gzipped else response.body
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', response.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(body)
+
+    # _____________________________________________________________________________
+    def log_message(self, format, *args):
+        _logger.debug(f'{self.address_string()} - {format % args}')
+
+
+# _____________________________________________________________________________
+def parse_args(args=None) -> argparse.Namespace:
+    arg_parser = argparse.ArgumentParser(description='Serve plots, rendering each when requested')
+    arg_parser.add_argument('--host', default='127.0.0.1',
+                            help='address to listen on (default: 127.0.0.1)')
+    arg_parser.add_argument('--port', type=int, default=8050,
+                            help='port to listen on (default: 8050)')
+    arg_parser.add_argument('--frame-dtype', choices=FRAME_DTYPES, default='float64',
+                            help='data type of prices held in memory (default: float64)')
+    arg_parser.add_argument('--data-source', choices=DATA_SOURCES, default='csv',
+                            help='read prices from csv files, or from the price store (default: csv)')
+    return arg_parser.parse_args(args)
+
+
+# _____________________________________________________________________________
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    app_path = Path(__file__).with_name('plotter.py')
+
+    def make_app_config() -> AppConfig:
+        return AppConfig(app_path, app_path.parents[1], frame_dtype=args.frame_dtype, data_source=args.data_source)
+
+    _Handler.renderer = PlotRenderer(make_app_config)
+    server = ThreadingHTTPServer((args.host, args.port), _Handler)
+    _logger.info(f'Serving plots on http://{args.host}:{server.server_port}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        _logger.info('Interrupted')
+    finally:
+        server.server_close()
+
+
+# _____________________________________________________________________________
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Data frame snapshots written each run to dated folders
+
+Feather (Arrow IPC) and Parquet keep dtypes and are much smaller and faster
+than csv.  Uncompressed feather files can be memory mapped and read without
+copying; compressed files are decompressed but never parsed.
+"""
+from __future__ import annotations
+import logging.handlers
+from os import PathLike
+from pathlib import Path
+from typing import Iterator, Optional, TYPE_CHECKING
+
+from appUtils import replace_file
+from instrumentation import span
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMATS = {'feather': '.feather', 'parquet': '.parquet', 'csv': '.csv'}
+DEFAULT_COMPRESSION = {'feather': 'lz4', 'parquet': 'zstd', 'csv': None}
+_INDEX_NAME = 'Date'
+
+
+# _____________________________________________________________________________
+def snapshot_filepath(path: PathLike, snapshot_format: str) -> Path:
+    return Path(path).with_suffix(SNAPSHOT_FORMATS[snapshot_format])
+
+
+# _____________________________________________________________________________
+def write_snapshot(df: pd.DataFrame, filepath: PathLike, snapshot_format: str, compression: Optional[str] = None):
+    """Write data frame in format, compression of None uses format default"""
+    filepath = Path(filepath)
+    if compression is None:
+        compression = DEFAULT_COMPRESSION[snapshot_format]
+    _logger.debug(f'Write snapshot {snapshot_format}/{compression}: "{filepath.name}"')
+
+    with span('snapshot_write', format=snapshot_format) as sp:
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f'Unknown snapshot format "{snapshot_format}"')
+        with replace_file(filepath) as tmp_filepath:
+            if snapshot_format == 'feather':
+                # Feather stores no index so keep dates as a column
+                df.reset_index().to_feather(tmp_filepath, compression=compression)
+            elif snapshot_format == 'parquet':
+                df.to_parquet(tmp_filepath, compression=compression)
+            else:
+                from dataParser import float_prices
+                float_prices(df).to_csv(tmp_filepath, compression=compression)
+        sp.set(rows=len(df), bytes=filepath.stat().st_size)
+
+
+# _____________________________________________________________________________
+def read_snapshot_table(filepath: PathLike):
+    """Memory map feather or parquet snapshot as a pyarrow table without converting to pandas"""
+    import pyarrow.feather as pf
+    import pyarrow.parquet as pq
+
+    filepath = Path(filepath)
+    if filepath.suffix == SNAPSHOT_FORMATS['feather']:
+        return pf.read_table(filepath, memory_map=True)
+    elif filepath.suffix == SNAPSHOT_FORMATS['parquet']:
+        return pq.read_table(filepath, memory_map=True)
+    raise ValueError(f'Not a binary snapshot: "{filepath.name}"')
+
+
+# _____________________________________________________________________________
+def read_snapshot(filepath: PathLike, columns: Optional[list[str]] = None) -> pd.DataFrame:
+    """Read snapshot of any format as a date indexed data frame"""
+    import pandas as pd
+
+    filepath = Path(filepath)
+    if filepath.suffix == SNAPSHOT_FORMATS['csv']:
+        usecols = [_INDEX_NAME, *columns] if columns else None
+        return pd.read_csv(filepath, index_col=_INDEX_NAME, usecols=usecols, parse_dates=[_INDEX_NAME])
+
+    table = read_snapshot_table(filepath)
+    if columns:
+        table = table.select([x for x in [_INDEX_NAME, *columns] if x in table.column_names])
+    df = table.to_pandas()
+    if _INDEX_NAME in df.columns:
+        df.set_index(_INDEX_NAME, inplace=True)
+    return df
+
+
+# _____________________________________________________________________________
+def iter_snapshots(base_path: PathLike, name: str) -> Iterator[tuple[str, Path]]:
+    """Snapshots of plot output name across dated folders, oldest first, as (folder name, filepath)"""
+    stem = Path(name).stem
+    for folder in sorted(x for x in Path(base_path).iterdir() if x.is_dir()):
+        for suffix in SNAPSHOT_FORMATS.values():
+            if (filepath := Path(folder, stem).with_suffix(suffix)).exists():
+                yield folder.name, filepath
+                break
@@ -0,0 +1,127 @@
+"""Rebuild plots as their input files or the plots configuration change
+
+Input files of all plots and the plots configuration are polled for changes
+of size or modification time.  Changes are collected until none are seen
+for the debounce period, so a burst of writes (eg a feed refreshing many
+files) causes one rebuild.  Only plots using a changed file are rebuilt,
+found from an index of plots by input file.  A change of configuration,
+or of day, reloads the configuration and rebuilds plots whose entries
+changed (see BuildManifest).  Parsed frames stay in memory between rebuilds,
+also in worker processes as the builder keeps its pool (see WorkerPool).
+"""
+from collections import defaultdict
+from datetime import date
+import logging.handlers
+from pathlib import Path
+import time
+from typing import Callable, Optional
+
+from appConfig import AppConfig
+from configParser import ConfigPlot
+from dataLoader import plot_input_paths
+from frameCache import FrameCache
+
+_logger = logging.getLogger(__name__)
+
+# Builds candidate plots of configuration, using frame cache
+BuildFunc = Callable[[AppConfig, list[ConfigPlot], FrameCache], object]
+
+
+# _____________________________________________________________________________
+def _stat(filepath: Path) -> Optional[tuple[int, int]]:
+    try:
+        stat = filepath.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+# _____________________________________________________________________________
+class Watcher:
+    """Polls plot inputs and configuration, rebuilding affected plots"""
+
+    # _____________________________________________________________________________
+    def __init__(self, make_app_config: Callable[[], AppConfig], build: BuildFunc,
+                 interval: float = 1.0, debounce: float = 2.0):
+        self._make_app_config = make_app_config
+        self._build = build
+        self._interval = interval
+        self._debounce = debounce
+        self._app_config: Optional[AppConfig] = None
+        self._frame_cache: Optional[FrameCache] = None
+        self._plots_by_input: dict[Path, list[ConfigPlot]] = {}
+        self._day = None
+
+    # _____________________________________________________________________________
+    def _load_config(self):
+        """(Re)load configuration and index plots by input file"""
+        self._app_config = self._make_app_config()
+        self._day = date.today()
+        if self._frame_cache is None:
+            self._frame_cache = FrameCache(self._app_config.frame_cache_path)
+
+        plots_by_input = defaultdict(list)
+        for plot_config in self._app_config.plot_configs:
+            for filepath in plot_input_paths(plot_config, self._app_config):
+                plots_by_input[filepath.resolve()].append(plot_config)
+        self._plots_by_input = dict(plots_by_input)
+        _logger.info(f'Watching {len(self._plots_by_input)} input files of '
+                     f'{len(self._app_config.plot_configs)} plots')
+
+    # _____________________________________________________________________________
+    def _poll(self) -> dict[Path, Optional[tuple[int, int]]]:
+        """Size and modification time of watched files, None where missing"""
+        filepaths = [self._app_config.config_filepath, *self._plots_by_input]
+        return {x: _stat(x) for x in filepaths}
+
+    # _____________________________________________________________________________
+    def _wait_for_changes(self, state: dict) -> tuple[set[Path], dict]:
+        """Block until watched files change and then stay unchanged for the debounce period"""
+        changed = set()
+        last_change = None
+        while True:
+            time.sleep(self._interval)
+            new_state = self._poll()
+            if diff := {x for x, v in new_state.items() if state.get(x) != v}:
+                changed |= diff
+                last_change = time.monotonic()
+            state = new_state
+            if last_change is not None and time.monotonic() - last_change >= self._debounce:
+                return changed, state
+            if date.today() != self._day:
+                return changed, state
+
+    # _____________________________________________________________________________
+    def _rebuild(self, candidates: Optional[list[ConfigPlot]] = None):
+        try:
+            plot_configs = self._app_config.plot_configs if candidates is None else candidates
+            self._build(self._app_config, plot_configs, self._frame_cache)
+        except Exception:
+            # Keep watching, a later change may fix the problem
+            _logger.exception('Rebuild failed')
+
+    # _____________________________________________________________________________
+    def run(self):
+        """Build plots, then rebuild those affected by each change until interrupted"""
+        # State taken before building so changes while building are seen
+        self._load_config()
+        state = self._poll()
+        self._rebuild()
+        while True:
+            changed, state = self._wait_for_changes(state)
+            if self._app_config.config_filepath in changed or date.today() != self._day:
+                _logger.info('Configuration or day changed: reloading')
+                try:
+                    self._load_config()
+                except Exception:
+                    _logger.exception('Configuration invalid, keeping previous')
+                    self._day = date.today()
+                    continue
+                state = self._poll()
+                self._rebuild()
+                continue
+
+            affected = {pc.idx: pc for x in changed for pc in self._plots_by_input.get(x, [])}
+            names = ', '.join(sorted(x.name for x in changed))
+            _logger.info(f'Changed: {names} - rebuilding {len(affected)} plots')
+            self._rebuild(sorted(affected.values(), key=lambda pc: pc.idx))
@@ -0,0 +1,121 @@
+"""Run registered preprocessors over all their input files
+
+Usage: python -m preprocess [name ...] [--jobs N] [--incremental]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import logging.handlers
+import multiprocessing
+from pathlib import Path
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Optional
+
+from plotter.appUtils import configure_logging, init_worker_logging
+from preprocess.preprocessor import load_preprocessors
+
+_logger = logging.getLogger(__name__)
+
+base_path = Path(__file__).parent
+# pdfminer logs each page at debug level
+_QUIET_LOGGERS = ('pdfminer',)
+
+
+# _____________________________________________________________________________
+def run_file(name: str, inp_path: Path, out_path: Path, incremental: bool = False) -> Optional[str]:
+    """Run preprocessor over one file, returning error text rather than raising"""
+    try:
+        preprocessor = load_preprocessors()[name]
+        count = preprocessor.process_file(inp_path, out_path, incremental)
+        _logger.debug(f'{name}: "{inp_path.name}" {count} rows')
+        return None
+    except Exception as ex:
+        _logger.exception(f'{name}: failed "{inp_path.name}"')
+        return ''.join(traceback.format_exception_only(type(ex), ex)).strip()
+
+
+# _____________________________________________________________________________
+def process(names: list[str], data_path: Path, out_path: Path, jobs: int = 1,
+            log_handlers: list[logging.Handler] = (), incremental: bool = False) -> dict[Path, str]:
+    """Run preprocessors over their input files, returning errors by input file"""
+    preprocessors = load_preprocessors()
+    if unknown := [x for x in names if x not in preprocessors]:
+        raise ValueError(f'Unknown preprocessors: {", ".join(unknown)}')
+
+    out_path.mkdir(parents=True, exist_ok=True)
+    tasks = [(p.name, inp_path) for p in preprocessors.values() if not names or p.name in names
+             for inp_path in p.input_files(data_path)]
+    if not tasks:
+        _logger.error(f'No input files found in "{data_path}"')
+    _logger.debug(f'process: {len(tasks)} files, {jobs} jobs')
+    if incremental:
+        for name in sorted({name for name, _ in tasks if not preprocessors[name].incremental}):
+            _logger.info(f'{name}: incremental conversion not supported, converting whole files')
+
+    errors = {}
+    if jobs <= 1 or len(tasks) <= 1:
+        for name, inp_path in tasks:
+            if error := run_file(name, inp_path, out_path, incremental):
+                errors[inp_path] = error
+    else:
+        log_queue = multiprocessing.Queue()
+        listener = logging.handlers.QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+        listener.start()
+        try:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker_logging,
+                                     initargs=(log_queue, _QUIET_LOGGERS)) as executor:
+                futures = [executor.submit(run_file, name, inp_path, out_path, incremental)
+                           for name, inp_path in tasks]
+                for (name, inp_path), future in zip(tasks, futures):
+                    try:
+                        error = future.result()
+                    except Exception as ex:
+                        error = f'worker failed: {ex!r}'
+                    if error:
+                        errors[inp_path] = error
+        finally:
+            listener.stop()
+
+    for name, inp_path in tasks:
+        if error := errors.get(inp_path):
+            _logger.error(f'{name}: "{inp_path.name}": {error}')
+    _logger.info(f'Files: {len(tasks) - len(errors)} converted, {len(errors)} failed')
+    return errors
+
+
+# _____________________________________________________________________________
+def parse_args(args=None) -> argparse.Namespace:
+    arg_parser = argparse.ArgumentParser(prog='preprocess', description='Transform provider unit prices to csv')
+    arg_parser.add_argument('names', nargs='*', help='preprocessors to run (default: all)')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help='number of files processed in parallel (default: 1)')
+    arg_parser.add_argument('--data', type=Path, default=Path(base_path, 'data'),
+                            help='folder of input files')
+    arg_parser.add_argument('--output', type=Path, default=Path(base_path, 'output'),
+                            help='folder of output files')
+    arg_parser.add_argument('-i', '--incremental', action='store_true',
+                            help='convert only lines appended to input files since the previous run')
+    return arg_parser.parse_args(args)
+
+
+# _____________________________________________________________________________
+def main():
+    args = parse_args()
+    log_handlers = configure_logging('output.log', logging.DEBUG, _QUIET_LOGGERS)
+    start_time = time.time()
+    try:
+        start_datetime = datetime.fromtimestamp(start_time)
+        _logger.info(f'Now: {start_datetime.strftime("%a  %d-%b-%y  %I:%M:%S %p")}')
+
+        process(args.names, args.data.resolve(), args.output.resolve(), args.jobs, log_handlers, args.incremental)
+    except Exception as ex:
+        _logger.exception('Catch all exception')
+    finally:
+        mins, secs = divmod(timedelta(seconds=time.time() - start_time).total_seconds(), 60)
+        _logger.info(f'Run time: {int(mins)}:{secs:0.1f}s')
+
+
+# _____________________________________________________________________________
+if __name__ == '__main__':
+    main()
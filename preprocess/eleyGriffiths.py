@@ -1,30 +1,35 @@
 """Transform and filter unit prices for Eley Giffiths funds
 
-Prices are provided in PDF files.  To extract unit prices:
-1. Load PDF and use "File > Save as text ..." to create text file
-2. Run python script over text file to create csv file.
+Prices are provided in PDF files with dates and prices laid out in columns.
+Text is extracted from the PDF and the columns reassembled into rows.
 """
-import csv
-from dateutil import parser
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+from io import StringIO
 import logging
+import multiprocessing
+import os
 from pathlib import Path
 import re
+from typing import Optional
 
-from pdfminer.high_level import extract_text_to_fp, extract_pages
-from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
-from pdfminer.converter import HTMLConverter, XMLConverter, TextConverter
+from pdfminer.high_level import extract_text_to_fp
 from pdfminer.layout import LAParams
-from io import StringIO
+from pdfminer.pdfpage import PDFPage
 
+from plotter.appUtils import replace_file
+from preprocess.preprocessor import register, output_filepath, parse_dates, write_csv
 
 re_date = re.compile(r'(20[\d]{6})')
 re_price = re.compile(r'(\d+(?:\.\d+))')
 
 _logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG,
-                    handlers=[logging.FileHandler('output.log', mode='w'), logging.StreamHandler()])
-logging.captureWarnings(True)
-logging.getLogger("pdfminer").setLevel(logging.ERROR)
+
+# Pages extracted per task; layout analysis of each page is independent so page ranges run in parallel
+PAGES_PER_TASK = 8
+EXTRACT_JOBS = os.cpu_count() or 1
+# Bump to invalidate cached text when extraction settings change
+_EXTRACT_VERSION = 1
 
 
 # _____________________________________________________________________________
@@ -47,44 +52,64 @@ def lines_iter(iter):
 
 
 # _____________________________________________________________________________
-# Setup
-base_path = Path(__file__).parent
-data_path = Path(base_path, 'data').resolve()
-out_path = Path(base_path, 'output').resolve()
-out_path.mkdir(parents=True, exist_ok=True)
-
-# Ready input
-inp_path = Path(data_path, 'Historical-Unit-Prices-ECF.pdf').resolve()
-if not inp_path.exists():
-    _logger.error(f'File not found "{inp_path}"')
-    exit(1)
-
-# Initialize
-entries = [list() for _ in range(5)]
-
-# Process
-_logger.info(f'Reading "{inp_path.name}"')
-with StringIO() as buf:
-    with open(str(inp_path), 'rb') as fp:
-        extract_text_to_fp(fp, buf, laparams=LAParams(), output_type='text', codec=None)
-        content = buf.getvalue()
-
-# Transform text
-_logger.info(f'Transforming text')
-for idx, line in lines_iter(content):
-    entries[idx].append(line)
-# convert string to dates
-entries[0] = [parser.parse(d, dayfirst=False) for d in entries[0]]
-rows = zip(entries[0], entries[1])
-
-for r in rows:
-    _logger.debug(f'> {r[0]}  {r[1]}')
-
-# Write output
-out_filename = Path(out_path, inp_path.name).with_suffix('.csv')
-_logger.info(f'Writing {out_filename.name}')
-with out_filename.open(mode='wt', newline='') as out:
-    csv_writer = csv.writer(out, quoting=csv.QUOTE_MINIMAL)
-    csv_writer.writerow(['Date', 'Exit'])
-    for row in rows:
-        csv_writer.writerow([f'{row[0]:%d-%m-%Y}', row[2]])
+def _extract_page_range(inp_path: Path, page_numbers: list[int]) -> str:
+    with StringIO() as buf:
+        with inp_path.open(mode='rb') as fp:
+            extract_text_to_fp(fp, buf, page_numbers=page_numbers, laparams=LAParams(), output_type='text', codec=None)
+        return buf.getvalue()
+
+
+# _____________________________________________________________________________
+def extract_text(inp_path: Path, cache_path: Path = None, jobs: Optional[int] = None) -> str:
+    """Text of PDF, extracted by page ranges in parallel and cached by content hash
+
+    Page texts are joined in page order so the result is the same as extracting
+    the whole document at once.  By default page ranges are extracted serially
+    in worker processes, whose pool already occupies the CPUs, otherwise by
+    EXTRACT_JOBS processes.
+    """
+    _logger.info(f'Reading "{inp_path.name}"')
+    content = inp_path.read_bytes()
+    cache_filepath = None
+    if cache_path:
+        digest = hashlib.sha256(content).hexdigest()
+        cache_filepath = Path(cache_path, f'{digest}.v{_EXTRACT_VERSION}.txt')
+        if cache_filepath.exists():
+            _logger.debug(f'Cache hit: "{inp_path.name}"')
+            return cache_filepath.read_text(encoding='utf-8')
+
+    # Extract page ranges
+    with inp_path.open(mode='rb') as fp:
+        page_count = sum(1 for _ in PDFPage.get_pages(fp))
+    ranges = [list(range(i, min(i + PAGES_PER_TASK, page_count))) for i in range(0, page_count, PAGES_PER_TASK)]
+    if jobs is None:
+        jobs = EXTRACT_JOBS if multiprocessing.parent_process() is None else 1
+    jobs = min(jobs, len(ranges))
+    _logger.debug(f'Extracting {page_count} pages: {len(ranges)} ranges, {jobs} jobs')
+    if jobs <= 1:
+        text = ''.join(_extract_page_range(inp_path, x) for x in ranges)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            text = ''.join(executor.map(_extract_page_range, [inp_path] * len(ranges), ranges))
+
+    if cache_filepath:
+        cache_filepath.parent.mkdir(parents=True, exist_ok=True)
+        with replace_file(cache_filepath) as tmp_filepath:
+            tmp_filepath.write_text(text, encoding='utf-8')
+    return text
+
+
+# _____________________________________________________________________________
+@register('eleyGriffiths', 'Historical-Unit-Prices-*.pdf')
+def process_file(inp_path: Path, out_path: Path, incremental: bool = False) -> int:
+    # Not incremental: PDF files are replaced rather than appended to
+    content = extract_text(inp_path, Path(out_path, 'cache'))
+
+    # Transform text; columns of each page are separated by blank lines
+    _logger.info(f'Transforming text')
+    entries = [list() for _ in range(5)]
+    for idx, line in lines_iter(content):
+        entries[idx].append(line)
+
+    rows = parse_dates([d, p] for d, p in zip(entries[0], entries[1]))
+    return write_csv(rows, output_filepath(inp_path, out_path), ['Date', 'Exit'])
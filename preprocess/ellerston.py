@@ -2,19 +2,16 @@
 Input 4 columns: date, application, NAV, redemption
 Output 3 columns: date, redemption, and redemption adjusted
 """
-import string
-from datetime import date, datetime
-import logging
 import csv
 from decimal import Decimal
+import numpy as np
+import pandas as pd
 from pathlib import Path
-from dateutil import parser
 import re
+from typing import Iterable, Iterator
 
-_logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG,
-                    handlers=[logging.FileHandler('output.log', mode='w'), logging.StreamHandler()])
-logging.captureWarnings(True)
+from plotter.dateParsing import parse_date_column
+from preprocess.preprocessor import register, output_filepath, read_lines, strip_lines, write_csv
 
 # Patch known bad data in Ellerston downloaded data
 patch_data_amc = {
@@ -26,6 +23,10 @@ patch_data_amc = {
 }
 patch_data_gmsc = {
 }
+patch_data_files = {
+    'ellerston-AMC.csv': patch_data_amc,
+    'ellerston-GMSC.csv': patch_data_gmsc
+}
 re_line = re.compile(r'(\d+(?:\.\d*)?)\s*(?:\(\s*([^)]+)\s*\))?')
 re_split = re.compile(r'[\s()]+')
 re_is_cum_dist = re.compile(r'\s\(\s*cum[\s-]', re.IGNORECASE)
@@ -33,90 +34,122 @@ re_is_ex_dist = re.compile(r'\s\(\s*ex[\s-]', re.IGNORECASE)
 
 
 # _____________________________________________________________________________
-def strip_line(iterator, patch_data):
-    for ln in iterator:
-        # Skip lines with no content and not starting with a digit
-        if (ln := ln.strip()) and ln[0].isdigit():
-            key = ln.split(',', 1)[0].strip()
-            if key in patch_data:
-                ln = patch_data[key]
-            yield ln
+def patch_lines(lines: Iterable[str], patch_data: dict[str, str]) -> Iterator[str]:
+    """Replace lines whose first value is a key of patch data"""
+    for ln in lines:
+        key = ln.split(',', 1)[0].strip()
+        yield patch_data.get(key, ln)
+
+
+# _____________________________________________________________________________
+def parse_items(items: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Parse redemption column as fixed point integers with a common scale
+
+    Returns values, decimal places of each value, ex and cum distribution flags.
+    Values are scaled by 10 ** (maximum decimal places).
+    """
+    g = items.str.extract(f'^(?:{re_line.pattern})')
+    if len(bad := np.flatnonzero(g[0].isna().to_numpy())):
+        raise ValueError(f' line "{items.iloc[bad[0]]}" could not be parsed')
+
+    parts = g[0].str.partition('.')
+    whole, fraction = parts[0], parts[2]
+    decimals = fraction.str.len().to_numpy(dtype=np.int64)
+    places = int(decimals.max(initial=0))
+    values = whole.astype(np.int64).to_numpy() * 10 ** places
+    if places:
+        values += fraction.str.ljust(places, '0').astype(np.int64).to_numpy()
+
+    notes = g[1].fillna('').str.lower()
+    is_dist = notes.str.contains('ex', regex=False).to_numpy()
+    is_cumm = notes.str.contains('cum', regex=False).to_numpy()
+    return values, decimals, is_dist, is_cumm
 
 
 # _____________________________________________________________________________
-def parse_item(item: str):
-    try:
-        g = re_line.match(item).groups()
-        redemption = Decimal(g[0])
-        if s := g[1]:
-            s = s.lower()
-            return redemption, s.find('ex') >= 0, s.find('cum') >= 0
-        else:
-            return redemption, False, False
-    except Exception as ex:
-        raise ValueError(f' line "{item}" could not be parsed', ex)
+def format_fixed(values: np.ndarray, decimals: np.ndarray, places: int) -> np.ndarray:
+    """Text of fixed point values scaled by 10 ** places, as str() of a Decimal with decimals places"""
+    text = np.empty(len(values), dtype=object)
+    for d in np.unique(decimals):
+        mask = decimals == d
+        v = values[mask] // 10 ** (places - d)
+        if d > 6:
+            # Decimal text switches to exponent notation for small values
+            text[mask] = [str(Decimal(int(x)).scaleb(-int(d))) for x in v]
+            continue
+        sign = np.where(v < 0, '-', '')
+        whole, fraction = np.divmod(np.abs(v), 10 ** d)
+        t = pd.Series(sign) + pd.Series(whole).astype(str)
+        if d:
+            t += '.' + pd.Series(fraction).astype(str).str.zfill(int(d))
+        text[mask] = t.to_numpy()
+    return text
 
 
 # _____________________________________________________________________________
-def process_file(inp_path: Path, patch_data: dict):
-    # Initialize
-    redemption, adj_redemption = Decimal(0.0), Decimal(0.0)
-    distribution, dist_redemption = Decimal(0.0), Decimal(0.0)
-    rows = list()
-
-    # Process
-    _logger.info(f'Reading "{inp_path.name}"')
-    with inp_path.open(mode='r', newline='') as fp:
-        csv_reader = csv.reader(strip_line(fp, patch_data), quoting=csv.QUOTE_MINIMAL)
-        for row in csv_reader:
-            if len(row) != 6:
-                raise ValueError('Expecting 6 CSV values')
-
-            date = parser.parse(row[0], dayfirst=True)
-            redemption, is_dist, is_cumm = parse_item(row[4])
-            if is_dist:
-                rows.append([date, redemption - adj_redemption, redemption])
-
-                row = next(csv_reader)
-                price, is_dist, is_cumm = parse_item(row[4])
-                if is_cumm:
-                    adj_redemption += price - redemption
-                elif parser.parse(row[0], dayfirst=True) == date:
-                    adj_redemption += price - redemption
-                else:
-                    adj_redemption += price - redemption
-                    rows.append([date, redemption - adj_redemption, redemption])
-
-            else:
-                rows.append([date, redemption - adj_redemption, redemption])
-    rows.sort(key=lambda x: x[0], reverse=True)
-
-    # Write output
-    out_filename = Path(out_path, inp_path.name).with_suffix('.csv')
-    _logger.info(f'Writing "{out_filename.name}"')
-    with out_filename.open(mode='wt', newline='') as out:
-        csv_writer = csv.writer(out, quoting=csv.QUOTE_MINIMAL)
-        csv_writer.writerow(['Date', 'Adj Exit', 'Exit'])
-        for row in rows:
-            csv_writer.writerow([f'{row[0]:%d-%m-%Y}', row[1], row[2]])
+def adjust_distributions(csv_rows: Iterable[list[str]]) -> Iterator[list]:
+    """Rows of date, redemption adjusted for distributions and redemption, newest first
+
+    An ex distribution row is paired with the row following it, and the price
+    difference accumulates into the adjustment applied to subsequent rows.
+    Rows are classified and the adjustment accumulated column wise with exact
+    fixed point integers.
+    """
+    rows = list(csv_rows)
+    if any(len(row) != 6 for row in rows):
+        raise ValueError('Expecting 6 CSV values')
+    if not rows:
+        return iter(())
+
+    columns = list(zip(*rows))
+    dates = parse_date_column(columns[0], dayfirst=True).to_numpy()
+    redemption, decimals, is_dist, is_cumm = parse_items(pd.Series(columns[4], dtype=str))
+    places = int(decimals.max())
+    n = len(rows)
+
+    # Ex distribution rows trigger an adjustment and consume the following row.  In a run of
+    # consecutive ex rows the consumed row is not a trigger, so triggers alternate from run start
+    idx = np.arange(n)
+    run_start = np.maximum.accumulate(np.where(is_dist & ~np.roll(is_dist, 1) | (idx == 0), idx, 0))
+    trigger = is_dist & ((idx - run_start) % 2 == 0)
+    if trigger[-1]:
+        raise ValueError(f'Expecting row after distribution on {pd.Timestamp(dates[-1]):%d-%m-%Y}')
+    consumed = np.roll(trigger, 1)
+    consumed[0] = False
+
+    # Adjustment of each trigger is price of consumed row less redemption
+    nxt = np.minimum(idx + 1, n - 1)
+    delta = np.where(trigger, redemption[nxt] - redemption, 0)
+    adj_incl = np.cumsum(delta)
+    adj_excl = adj_incl - delta
+    adj_decimals_incl = np.maximum.accumulate(np.where(trigger, np.maximum(decimals[nxt], decimals), 0))
+    adj_decimals_excl = np.concatenate(([0], adj_decimals_incl[:-1]))
+
+    # Extra row, adjusted to include its own distribution, where consumed row is neither cum nor same date
+    extra = trigger & ~is_cumm[nxt] & (dates[nxt] != dates)
+
+    # Output in input order, then newest first keeping input order of equal dates
+    keep = np.flatnonzero(~consumed)
+    more = np.flatnonzero(extra)
+    src = np.concatenate((keep, more))
+    order = np.lexsort((np.concatenate((np.zeros(len(keep)), np.ones(len(more)))), src))
+    src = src[order]
+    adj = np.concatenate((adj_excl[keep], adj_incl[more]))[order]
+    adj_decimals = np.concatenate((adj_decimals_excl[keep], adj_decimals_incl[more]))[order]
+    order = np.argsort(-dates[src].astype(np.int64), kind='stable')
+    src, adj, adj_decimals = src[order], adj[order], adj_decimals[order]
+
+    adj_exit = format_fixed(redemption[src] - adj, np.maximum(decimals[src], adj_decimals), places)
+    exit_ = format_fixed(redemption[src], decimals[src], places)
+    out_dates = pd.DatetimeIndex(dates[src]).to_pydatetime()
+    return map(list, zip(out_dates, adj_exit, exit_))
 
 
 # _____________________________________________________________________________
-# Setup
-base_path = Path(__file__).parent
-data_path = Path(base_path, 'data').resolve()
-out_path = Path(base_path, 'output').resolve()
-out_path.mkdir(parents=True, exist_ok=True)
-
-# Ready input
-inp_path = Path(data_path, 'ellerston-AMC.csv').resolve()
-if inp_path.exists():
-    process_file(inp_path, patch_data_amc)
-else:
-    _logger.error(f'File not found "{inp_path.name}"')
-
-inp_path = Path(data_path, 'ellerston-GMSC.csv').resolve()
-if inp_path.exists():
-    process_file(inp_path, patch_data_gmsc)
-else:
-    _logger.error(f'File not found "{inp_path.name}"')
+@register('ellerston', 'ellerston-*.csv')
+def process_file(inp_path: Path, out_path: Path, incremental: bool = False) -> int:
+    # Not incremental: a new distribution changes the adjusted price of all earlier rows
+    lines = patch_lines(strip_lines(read_lines(inp_path), digits_only=True), patch_data_files.get(inp_path.name, {}))
+    csv_reader = csv.reader(lines, quoting=csv.QUOTE_MINIMAL)
+    return write_csv(adjust_distributions(csv_reader), output_filepath(inp_path, out_path),
+                     ['Date', 'Adj Exit', 'Exit'], sort=False)
@@ -0,0 +1,314 @@
+"""Registry of preprocessors and the streaming stages they share
+
+A preprocessor converts one provider input file into a csv file of
+(Date, values ...) rows, newest first.  Preprocessors are registered by name
+with glob patterns of the input files they handle, and compose generator
+stages so rows stream from reading through to writing.
+
+Preprocessors of line based files registered as incremental convert only
+lines appended to the input since the previous run (see process_lines).
+"""
+import csv
+from dataclasses import dataclass
+from datetime import datetime
+import hashlib
+import importlib
+from io import StringIO
+from itertools import chain, islice
+import json
+import locale
+import logging
+import os
+from pathlib import Path
+import re
+import shutil
+from typing import Callable, Iterable, Iterator, Optional
+
+from plotter.appUtils import replace_file
+from plotter.dateParsing import DateParser
+
+_logger = logging.getLogger(__name__)
+
+# Modules registering preprocessors, imported on demand by load_preprocessors
+_MODULES = ['eleyGriffiths', 'ellerston', 'investingWebsite', 'spherica', 'wcm']
+_REGISTRY: dict[str, 'Preprocessor'] = {}
+
+OUTPUT_DATE_FORMAT = '%d-%m-%Y'
+
+# Bytes either end of the processed part of an input hashed to detect it was rewritten rather than appended to
+_PREFIX_SAMPLE_SIZE = 1 << 16
+# Lines before the end of the processed part read again, so records spanning lines are never split
+_OVERLAP_LINES = 16
+_STATE_VERSION = 1
+
+
+# _____________________________________________________________________________
+@dataclass
+class Preprocessor:
+    __slots__ = ['name', 'patterns', 'process_file', 'incremental']
+
+    name: str
+    patterns: tuple[str, ...]
+    process_file: Callable[[Path, Path, bool], int]
+    incremental: bool
+
+    # _____________________________________________________________________________
+    def input_files(self, data_path: Path) -> list[Path]:
+        files = {x.resolve() for pattern in self.patterns for x in Path(data_path).glob(pattern) if x.is_file()}
+        return sorted(files)
+
+
+# _____________________________________________________________________________
+def register(name: str, *patterns: str, incremental: bool = False):
+    """Decorator registering function(inp_path, out_path, incremental) -> rows written as a preprocessor
+
+    Preprocessors not supporting incremental conversion ignore the incremental argument.
+    """
+    def decorator(func: Callable[[Path, Path, bool], int]):
+        _REGISTRY[name] = Preprocessor(name, patterns, func, incremental)
+        return func
+    return decorator
+
+
+# _____________________________________________________________________________
+def load_preprocessors() -> dict[str, Preprocessor]:
+    for module in _MODULES:
+        importlib.import_module(f'{__package__}.{module}')
+    return dict(_REGISTRY)
+
+
+# _____________________________________________________________________________
+def output_filepath(inp_path: Path, out_path: Path) -> Path:
+    return Path(out_path, inp_path.name).with_suffix('.csv')
+
+
+# =============================================================================
+# Stages
+
+# _____________________________________________________________________________
+def read_lines(inp_path: Path) -> Iterator[str]:
+    _logger.info(f'Reading "{inp_path.name}"')
+    with inp_path.open(mode='r', newline='') as fp:
+        yield from fp
+
+
+# _____________________________________________________________________________
+def strip_lines(lines: Iterable[str], digits_only: bool = False) -> Iterator[str]:
+    """Strip lines, skipping those with no content or, if digits_only, not starting with a digit"""
+    for ln in lines:
+        if (ln := ln.strip()) and (not digits_only or ln[0].isdigit()):
+            yield ln
+
+
+# _____________________________________________________________________________
+def group_rows(lines: Iterable[str], re_date: re.Pattern, re_price: re.Pattern) -> Iterator[list[str]]:
+    """Group a date line and the price lines following it into a row [date, price, ...]
+
+    Dates without at least one price, and prices before the first date, are dropped.
+    """
+    row = []
+    for line in lines:
+        if match_price := re_price.match(line):
+            if row:
+                row.append(match_price[1])
+        elif match_date := re_date.match(line):
+            if len(row) > 1:
+                yield row
+            row = [match_date[1]]
+    if len(row) > 1:
+        yield row
+
+
+# _____________________________________________________________________________
+def parse_dates(rows: Iterable[list], dayfirst: bool = False, sample_size: int = 20) -> Iterator[list]:
+    """Replace date text in first column of each row with a datetime
+
+    Date format is inferred once from the first rows, then each row is parsed
+    with that format.
+    """
+    rows = iter(rows)
+    head = list(islice(rows, sample_size))
+    date_parser = DateParser(dayfirst=dayfirst)
+    date_parser.infer(row[0] for row in head)
+
+    for row in chain(head, rows):
+        row[0] = date_parser(row[0])
+        yield row
+    if date_parser.fallbacks:
+        _logger.debug(f'Date format {date_parser.format}: {date_parser.fallbacks} values parsed by dateutil')
+
+
+# _____________________________________________________________________________
+def select_columns(rows: Iterable[list], *columns: int) -> Iterator[list]:
+    """Keep date and value columns by index, skipping rows that are too short"""
+    width = max(columns) + 1
+    for row in rows:
+        if len(row) < width:
+            _logger.warning(f'Skip short row {row}')
+            continue
+        yield [row[0], *(row[i] for i in columns)]
+
+
+# _____________________________________________________________________________
+def write_csv(rows: Iterable[list], out_filename: Path, header: list[str],
+              sort: bool = True) -> int:
+    """Write rows newest first, returning number of rows written
+
+    Sorting requires all rows to be held, so sources whose rows are already
+    newest first pass sort=False and rows stream straight through; their
+    order is checked as they are written.  Output is written to a temporary
+    file renamed over the output, so an interrupted run never leaves a
+    truncated output.
+    """
+    if sort:
+        rows = sorted(rows, key=lambda x: x[0], reverse=True)
+
+    _logger.info(f'Writing "{out_filename.name}"')
+    count = 0
+    previous = None
+    with replace_file(out_filename) as tmp_filename, tmp_filename.open(mode='wt', newline='') as out:
+        csv_writer = csv.writer(out, quoting=csv.QUOTE_MINIMAL)
+        csv_writer.writerow(header)
+        for row in rows:
+            if previous is not None and row[0] > previous:
+                raise ValueError(f'Rows not newest first: {row[0]:{OUTPUT_DATE_FORMAT}} after '
+                                 f'{previous:{OUTPUT_DATE_FORMAT}}')
+            previous = row[0]
+            csv_writer.writerow([f'{row[0]:{OUTPUT_DATE_FORMAT}}', *row[1:]])
+            count += 1
+    return count
+
+
+# =============================================================================
+# Incremental conversion
+
+# _____________________________________________________________________________
+def _state_filepath(inp_path: Path, out_path: Path) -> Path:
+    return Path(out_path, 'state', f'{inp_path.name}.json')
+
+
+# _____________________________________________________________________________
+def _prefix_hash(fp, offset: int) -> str:
+    """Hash of the start and end of the first offset bytes of file"""
+    h = hashlib.sha256(str(offset).encode())
+    fp.seek(0)
+    h.update(fp.read(min(offset, _PREFIX_SAMPLE_SIZE)))
+    fp.seek(max(0, offset - _PREFIX_SAMPLE_SIZE))
+    h.update(fp.read(min(offset, _PREFIX_SAMPLE_SIZE)))
+    return h.hexdigest()
+
+
+# _____________________________________________________________________________
+def _line_offsets(data: bytes, start: int) -> tuple[int, int]:
+    """Offsets after last complete line of data and of the start of the overlap lines before it"""
+    end = data.rfind(b'\n') + 1
+    overlap = end
+    for _ in range(_OVERLAP_LINES):
+        if overlap <= 0:
+            break
+        overlap = data.rfind(b'\n', 0, overlap - 1) + 1
+    return start + end, start + overlap
+
+
+# _____________________________________________________________________________
+def _load_state(state_filepath: Path) -> Optional[dict]:
+    try:
+        state = json.loads(state_filepath.read_text())
+        return state if state.get('version') == _STATE_VERSION else None
+    except (OSError, ValueError):
+        return None
+
+
+# _____________________________________________________________________________
+def _save_state(state_filepath: Path, fp, offsets: tuple[int, int], last_date: Optional[datetime]):
+    offset, overlap_offset = offsets
+    state = {'version': _STATE_VERSION, 'offset': offset, 'overlapOffset': overlap_offset,
+             'prefixHash': _prefix_hash(fp, offset), 'lastDate': last_date.isoformat() if last_date else None}
+    state_filepath.parent.mkdir(parents=True, exist_ok=True)
+    with replace_file(state_filepath) as tmp_filepath:
+        tmp_filepath.write_text(json.dumps(state))
+
+
+# _____________________________________________________________________________
+def _prepend_rows(rows: list[list], out_filename: Path, header: list[str]) -> int:
+    """Write new rows, newest first, ahead of rows of existing output
+
+    Existing rows are copied as bytes without being parsed, but the whole
+    output is still rewritten, so this takes time in proportion to the full
+    history rather than to the new rows.
+    """
+    rows.sort(key=lambda x: x[0], reverse=True)
+    with replace_file(out_filename) as tmp_filename:
+        with out_filename.open(mode='rb') as old, tmp_filename.open(mode='wb') as new:
+            old.readline()  # Skip header
+            with StringIO(newline='') as buf:
+                csv_writer = csv.writer(buf, quoting=csv.QUOTE_MINIMAL)
+                csv_writer.writerow(header)
+                for row in rows:
+                    csv_writer.writerow([f'{row[0]:{OUTPUT_DATE_FORMAT}}', *row[1:]])
+                new.write(buf.getvalue().encode(locale.getpreferredencoding(False)))
+            shutil.copyfileobj(old, new)
+    return len(rows)
+
+
+# _____________________________________________________________________________
+def _process_tail(fp, state: dict, inp_path: Path, out_filename: Path,
+                  rows_func: Callable[[Iterable[str]], Iterable[list]], header: list[str]) -> Optional[int]:
+    """Convert lines after those already processed, or return None if the whole file must be converted"""
+    start = state['overlapOffset']
+    fp.seek(start)
+    data = fp.read()
+    encoding = locale.getpreferredencoding(False)
+    overlap_lines = StringIO(data[:state['offset'] - start].decode(encoding), newline='').readlines()
+    lines = StringIO(data.decode(encoding), newline='').readlines()
+    _logger.info(f'Reading "{inp_path.name}" from offset {start:,}: {len(lines)} lines')
+
+    # Rows from overlap lines were written before; any other rows not newer than those written are out of order
+    last_date = datetime.fromisoformat(state['lastDate']) if state['lastDate'] else None
+    rows = list(rows_func(lines))
+    if last_date is not None:
+        old_count = sum(1 for row in rows if row[0] <= last_date)
+        if old_count > sum(1 for row in rows_func(overlap_lines) if row[0] <= last_date):
+            _logger.info(f'New lines hold older dates, converting all of "{inp_path.name}"')
+            return None
+        rows = [row for row in rows if row[0] > last_date]
+
+    count = _prepend_rows(rows, out_filename, header) if rows else 0
+    _logger.info(f'Prepended {count} rows to "{out_filename.name}"')
+    last_date = max((row[0] for row in rows), default=last_date)
+    _save_state(_state_filepath(inp_path, out_filename.parent), fp, _line_offsets(data, start), last_date)
+    return count
+
+
+# _____________________________________________________________________________
+def process_lines(inp_path: Path, out_path: Path, rows_func: Callable[[Iterable[str]], Iterable[list]],
+                  header: list[str], incremental: bool = False, sort: bool = True) -> int:
+    """Convert line based input file with rows_func, returning rows written
+
+    Rows of inputs that are newest first need no sorting (see write_csv).
+
+    Incremental conversion records how far the input was read and the newest
+    date written.  When the input has only been appended to, only the new
+    lines (and a few lines before them, so no record is split) are converted
+    and rows newer than those written are prepended to the output.
+    Otherwise, or if new lines hold older dates, the whole file is converted.
+    """
+    out_filename = output_filepath(inp_path, out_path)
+    if not incremental:
+        return write_csv(rows_func(read_lines(inp_path)), out_filename, header, sort)
+
+    state_filepath = _state_filepath(inp_path, out_path)
+    state = _load_state(state_filepath) if out_filename.exists() else None
+    with inp_path.open(mode='rb') as fp:
+        size = fp.seek(0, os.SEEK_END)
+        if state and state['offset'] <= size and _prefix_hash(fp, state['offset']) == state['prefixHash']:
+            if (count := _process_tail(fp, state, inp_path, out_filename, rows_func, header)) is not None:
+                return count
+
+        # Whole file, noting newest date written and offsets of the end of the file
+        rows = list(rows_func(read_lines(inp_path)))
+        count = write_csv(rows, out_filename, header, sort)
+        start = max(0, size - _PREFIX_SAMPLE_SIZE)
+        fp.seek(start)
+        _save_state(state_filepath, fp, _line_offsets(fp.read(), start), max((row[0] for row in rows), default=None))
+        return count
@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Tests import benchmark from the repo root, and plotter modules import their siblings by name,
+# as when run from the plotter folder
+_ROOT_PATH = Path(__file__).parents[1]
+for path in (_ROOT_PATH, Path(_ROOT_PATH, 'plotter')):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+
+# _____________________________________________________________________________
+def pytest_addoption(parser):
+    parser.addoption('--run-slow', action='store_true', help='also run slow tests, eg timings')
+
+
+# _____________________________________________________________________________
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'slow: slow or wall clock timing test, run only with --run-slow')
+
+
+# _____________________________________________________________________________
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--run-slow'):
+        return
+    skip_slow = pytest.mark.skip(reason='slow, run with --run-slow')
+    for item in items:
+        if 'slow' in item.keywords:
+            item.add_marker(skip_slow)
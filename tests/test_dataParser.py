@@ -0,0 +1,78 @@
+from pathlib import Path
+import time
+
+import numpy as np
+import pytest
+
+from benchmark.generator import write_yahoo
+from dataParser import CsvParser, DataSource
+
+_TICKER_COUNTS = (50, 100, 250, 500)
+# Time per ticker may grow by at most this factor from the fewest to the most tickers
+_MAX_GROWTH = 2.5
+
+
+# _____________________________________________________________________________
+@pytest.fixture(scope='module')
+def yahoo_filepaths(tmp_path_factory) -> list[Path]:
+    path = tmp_path_factory.mktemp('data')
+    rng = np.random.default_rng(1)
+    days = np.arange(np.datetime64('2019-07-01'), np.datetime64('2021-07-01'), dtype='datetime64[D]')
+    days = days[np.is_busday(days)]
+    filepaths = [Path(path, f'SYN{i:03d}.csv') for i in range(max(_TICKER_COUNTS))]
+    for filepath in filepaths:
+        write_yahoo(filepath, rng, days)
+    return filepaths
+
+
+# _____________________________________________________________________________
+def _data_sources(filepaths: list[Path]) -> list[DataSource]:
+    return [DataSource(x.stem, x, {'Exit': 'Adj Close'}, '%Y-%m-%d', None) for x in filepaths]
+
+
+# _____________________________________________________________________________
+def _parse_seconds(filepaths: list[Path], repeat: int = 3) -> float:
+    data_sources = _data_sources(filepaths)
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        CsvParser().parses(data_sources)
+        seconds.append(time.perf_counter() - start)
+    return min(seconds)
+
+
+# _____________________________________________________________________________
+def test_parses_columns(yahoo_filepaths):
+    df = CsvParser().parses(_data_sources(yahoo_filepaths[:3]))
+    assert list(df.columns) == ['SYN000', 'SYN001', 'SYN002']
+    assert df.index.is_monotonic_increasing
+    assert not df.isna().any().any()
+
+
+# _____________________________________________________________________________
+def test_parses_reads_each_file_once(yahoo_filepaths, monkeypatch):
+    import dataParser
+
+    calls = {'read_csv': 0, 'assemble_frame': 0}
+
+    def counted(name, func):
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(dataParser.pd, 'read_csv', counted('read_csv', dataParser.pd.read_csv))
+    monkeypatch.setattr(dataParser, 'assemble_frame', counted('assemble_frame', dataParser.assemble_frame))
+    n = max(_TICKER_COUNTS)
+    df = CsvParser().parses(_data_sources(yahoo_filepaths[:n]))
+    # Work is one read per file and a single assembly of all columns, however many tickers
+    assert calls == {'read_csv': n, 'assemble_frame': 1}
+    assert len(df.columns) == n
+
+
+# _____________________________________________________________________________
+@pytest.mark.slow
+def test_parses_scales_linearly(yahoo_filepaths):
+    per_ticker = {n: _parse_seconds(yahoo_filepaths[:n]) / n for n in _TICKER_COUNTS}
+    growth = per_ticker[max(_TICKER_COUNTS)] / per_ticker[min(_TICKER_COUNTS)]
+    assert growth < _MAX_GROWTH, f'seconds per ticker: {per_ticker}'